@@ -0,0 +1,279 @@
+"""
+SHARED ARROW SNAPSHOT CACHE
+Local snapshot of the fact tables stored as uncompressed Arrow IPC (Feather
+v2) files. Readers memory-map the files, so every notebook kernel and script
+on the box shares the same OS page cache instead of holding its own copy,
+and opening a table costs only the mmap.
+
+Each refresh writes a new, uniquely named file (via a temp file and
+os.replace) and then atomically swaps manifest.json to point at it. Readers that still map the old file keep working (and on
+Windows the old file is simply left for the next refresh to clean up).
+
+With POWERFAB_SNAPSHOT_FORMAT=parquet (or --format parquet) tables are
+written compressed instead: dictionary-encoded text, delta-encoded integer
+and date columns, zstd (POWERFAB_SNAPSHOT_CODEC, e.g. lz4) and min/max
+statistics per row group, so scan() with filters skips row groups that
+cannot match. Typically a tenth of the size; reads decode instead of map.
+
+Usage:
+    python arrow_cache.py refresh [table ...] [--workers N] [--format arrow|parquet]
+    python arrow_cache.py list
+"""
+import json
+import os
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from fast_fetch import fetch_frame
+from parallel_extract import extract_table
+from powerfab_db import local_path, table_columns
+
+SNAPSHOT_DIR = 'snapshot'
+MANIFEST = 'manifest.json'
+
+FACT_TABLES = [
+    'timerecords',
+    'productioncontrolitemstations',
+    'productioncontrolitems',
+    'productioncontroljobs',
+    'productioncontrolsequences',
+    'estimates',
+    'estimateitems',
+    'estimateitemlaborgroups',
+]
+LOOKUP_TABLES = ['projects', 'stations', 'laborgroups', 'stationlaborgroups', 'users']
+ESTIMATE_TABLES = ['estimates', 'estimateitems', 'estimateitemlaborgroups']
+
+SNAPSHOT_FORMAT = os.getenv('POWERFAB_SNAPSHOT_FORMAT', 'arrow')
+CODEC = os.getenv('POWERFAB_SNAPSHOT_CODEC', 'zstd')
+ROW_GROUP_ROWS = 128 * 1024
+EXTENSIONS = {'arrow': '.arrow', 'parquet': '.parquet'}
+
+# Per-process handles: table -> (file name, pyarrow Table backed by the mmap)
+_open = {}
+
+
+def snapshot_path(name):
+    return local_path(SNAPSHOT_DIR, name)
+
+
+def load_manifest():
+    path = snapshot_path(MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    tmp = snapshot_path(MANIFEST + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(tmp, snapshot_path(MANIFEST))
+
+
+def write_parquet(data, path):
+    """Compressed snapshot file: dictionary text, delta ints/dates, row-group stats."""
+    dictionary = [f.name for f in data.schema
+                  if pa.types.is_string(f.type) or pa.types.is_large_string(f.type) or pa.types.is_binary(f.type)]
+    delta = {f.name: 'DELTA_BINARY_PACKED' for f in data.schema
+             if pa.types.is_integer(f.type) or pa.types.is_temporal(f.type)}
+    pq.write_table(data, path, compression=CODEC, use_dictionary=dictionary, column_encoding=delta,
+                   row_group_size=ROW_GROUP_ROWS, write_statistics=True)
+
+
+def write_snapshot(table, data, fmt=None, **meta):
+    """
+    Write a table to the snapshot and publish it in the manifest.
+
+    Args:
+        table: Table name
+        data: pyarrow Table
+        fmt: 'arrow' (uncompressed, memory-mapped) or 'parquet' (compressed),
+            defaults to SNAPSHOT_FORMAT
+        meta: Extra manifest fields kept with the entry (e.g. watermarks)
+
+    Returns:
+        Manifest entry for the table
+    """
+    fmt = fmt or SNAPSHOT_FORMAT
+    # Unique per write - reusing a name would rewrite a file readers have mapped
+    name = f"{table}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:12]}{EXTENSIONS[fmt]}"
+    path = snapshot_path(name)
+    tmp = path + '.tmp'
+    if fmt == 'parquet':
+        write_parquet(data, tmp)
+    else:
+        # Uncompressed so readers can map the buffers without decoding
+        with pa.OSFile(tmp, 'wb') as sink:
+            with pa.ipc.new_file(sink, data.schema) as writer:
+                writer.write_table(data)
+    os.replace(tmp, path)
+
+    manifest = load_manifest()
+    manifest[table] = {
+        'file': name,
+        'format': fmt,
+        'rows': data.num_rows,
+        'bytes': os.path.getsize(path),
+        'raw_bytes': data.nbytes,
+        'written': time.strftime('%Y-%m-%d %H:%M:%S'),
+        **meta,
+    }
+    save_manifest(manifest)
+
+    # Drop superseded files, including ones left behind by earlier refreshes
+    for stale in os.listdir(snapshot_path('')):
+        if stale.startswith(f"{table}-") and stale.endswith(tuple(EXTENSIONS.values())) and stale != name:
+            try:
+                os.remove(snapshot_path(stale))
+            except OSError:
+                # Still mapped by a reader on Windows - retried next refresh
+                pass
+    return manifest[table]
+
+
+def manifest_entry(table):
+    entry = load_manifest().get(table)
+    if entry is None:
+        raise KeyError(f"{table} is not in the snapshot - run: python arrow_cache.py refresh {table}")
+    return entry
+
+
+def open_table(table):
+    """
+    Memory-map a snapshot table (zero-copy for the arrow format; parquet
+    files are decoded once per process).
+
+    Returns:
+        pyarrow Table whose buffers live in the shared page cache
+    """
+    entry = manifest_entry(table)
+    cached = _open.get(table)
+    if cached and cached[0] == entry['file']:
+        return cached[1]
+    path = snapshot_path(entry['file'])
+    if entry.get('format') == 'parquet':
+        data = pq.read_table(path, memory_map=True)
+    else:
+        data = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    _open[table] = (entry['file'], data)
+    return data
+
+
+def scan(table, columns=None, filters=None):
+    """
+    Read only the needed columns and rows of a snapshot table.
+
+    Args:
+        table: Table name
+        columns: Optional subset of columns
+        filters: pyarrow.dataset expression or DNF list such as
+            [('StartDate', '>=', datetime(2024, 1, 1))]; on parquet files
+            row groups whose min/max statistics exclude it are not read
+
+    Returns:
+        pyarrow Table
+    """
+    entry = manifest_entry(table)
+    if entry.get('format') == 'parquet':
+        return pq.read_table(snapshot_path(entry['file']), columns=columns, filters=filters, memory_map=True)
+    data = open_table(table)
+    if filters is not None:
+        expression = filters if isinstance(filters, ds.Expression) else pq.filters_to_expression(filters)
+        data = ds.dataset(data).to_table(filter=expression)
+    return data.select(columns) if columns else data
+
+
+def open_frame(table, columns=None, filters=None):
+    """
+    Open a snapshot table as a DataFrame without copying it into the kernel.
+
+    Args:
+        table: Table name
+        columns: Optional subset of columns
+        filters: Optional row filter, see scan()
+
+    Returns:
+        pandas DataFrame with Arrow-backed columns over the memory map
+    """
+    data = open_table(table) if filters is None else scan(table, filters=filters)
+    if columns:
+        data = data.select(columns)
+    return data.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def open_estimates():
+    """The full estimate dataset as a dict of table name -> DataFrame."""
+    return {table: open_frame(table) for table in ESTIMATE_TABLES}
+
+
+def load_table(table, columns=None, where=None):
+    """
+    Columns from the local snapshot if there is one, else the server.
+
+    Args:
+        table: Table name
+        columns: Optional subset of columns
+        where: SQL filter for the server read only - snapshot rows come back
+            unfiltered, so callers filter the frame as well
+
+    Returns:
+        pandas DataFrame
+    """
+    if table in load_manifest():
+        return open_frame(table, columns)
+    where_sql = f" WHERE {where}" if where else ""
+    return fetch_frame(f"SELECT {', '.join(columns) if columns else '*'} FROM {table}{where_sql}")
+
+
+def load_columns(table):
+    """Column names from the local snapshot if there is one, else the server."""
+    if table in load_manifest():
+        return open_table(table).schema.names
+    return table_columns(table)
+
+
+def refresh(tables=None, workers=4, fmt=None):
+    """
+    Re-extract tables from the server into the snapshot.
+
+    Args:
+        tables: Table names, defaults to FACT_TABLES + LOOKUP_TABLES
+        workers: Parallel extraction workers per table
+        fmt: Snapshot format, see write_snapshot()
+
+    Returns:
+        dict of table -> manifest entry
+    """
+    entries = {}
+    for table in tables or FACT_TABLES + LOOKUP_TABLES:
+        entries[table] = write_snapshot(table, extract_table(table, workers=workers), fmt)
+    return entries
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=['refresh', 'list'])
+    parser.add_argument('tables', nargs='*')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--format', choices=sorted(EXTENSIONS))
+    args = parser.parse_args()
+
+    if args.command == 'refresh':
+        refresh(args.tables or None, workers=args.workers, fmt=args.format)
+
+    print(f"  {'Table':<35} {'Format':<8} {'Rows':>10} {'MB':>8} {'Raw MB':>8}  Written")
+    for table, entry in sorted(load_manifest().items()):
+        raw = entry.get('raw_bytes', entry['bytes'])
+        print(f"  {table:<35} {entry.get('format', 'arrow'):<8} {entry['rows']:>10} "
+              f"{entry['bytes'] / 1e6:>8.1f} {raw / 1e6:>8.1f}  {entry['written']}")
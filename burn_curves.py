@@ -0,0 +1,110 @@
+"""
+CUMULATIVE BURN CURVES - READ-ONLY
+Hours burned over time against the estimate, per job (optionally per
+station), computed on the server.
+
+Time records are summed per day inside MySQL and the running total is a
+window function (SUM() OVER (PARTITION BY job ORDER BY day), MySQL 8), so
+only one row per job per working day crosses the network - not every time
+record. Jobs are sent BATCH_JOBS at a time, one statement per batch.
+
+Jobs are linked to time through ProjectID, like Pattern 6.
+
+Usage:
+    python burn_curves.py [--job ProductionControlID ...] [--by-station]
+"""
+import pandas as pd
+
+from fast_fetch import fetch_frame
+from powerfab_db import run_query
+
+BATCH_JOBS = 200
+
+HOURS = "tr.RegularHours + tr.OvertimeHours + tr.Overtime2Hours"
+
+
+def curve_sql(job_count, by_station=False):
+    station = "tr.StationID, " if by_station else ""
+    partition = "j.ProductionControlID, d.StationID" if by_station else "j.ProductionControlID"
+    return f"""
+        WITH j AS (
+            SELECT ProductionControlID, ProjectID, TotalManHours
+            FROM productioncontroljobs
+            WHERE ProductionControlID IN ({', '.join(['%s'] * job_count)})
+        ),
+        d AS (
+            SELECT tr.ProjectID, {station}DATE(tr.StartDate) as Day,
+                   SUM(COALESCE({HOURS}, 0)) as Hours
+            FROM timerecords tr
+            WHERE tr.ProjectID IN (SELECT ProjectID FROM j)
+            GROUP BY tr.ProjectID, {station}Day
+        )
+        SELECT j.ProductionControlID, {'d.StationID, ' if by_station else ''}d.Day, d.Hours,
+               SUM(d.Hours) OVER (PARTITION BY {partition} ORDER BY d.Day) as CumulativeHours,
+               j.TotalManHours as BudgetHours
+        FROM j
+        JOIN d ON d.ProjectID = j.ProjectID
+        ORDER BY {partition}, d.Day
+    """
+
+
+def burn_curves(jobs, by_station=False, pool_name='powerfab'):
+    """
+    Daily cumulative actual hours for many jobs.
+
+    Args:
+        jobs: ProductionControlIDs
+        by_station: One curve per job and station instead of per job
+        pool_name: Pool to run the batches on
+
+    Returns:
+        DataFrame with ProductionControlID, [StationID,] Day, Hours,
+        CumulativeHours, BudgetHours and PctOfBudget (job totals; station
+        curves are against the whole job budget)
+    """
+    jobs = list(jobs)
+    frames = []
+    for start in range(0, len(jobs), BATCH_JOBS):
+        batch = jobs[start:start + BATCH_JOBS]
+        frames.append(fetch_frame(curve_sql(len(batch), by_station), tuple(batch), pool_name=pool_name))
+    if not frames:
+        return pd.DataFrame(columns=['ProductionControlID', 'Day', 'Hours', 'CumulativeHours', 'BudgetHours'])
+    curves = pd.concat(frames, ignore_index=True)
+    for column in ['Hours', 'CumulativeHours', 'BudgetHours']:
+        curves[column] = curves[column].astype('float64')
+    curves['PctOfBudget'] = (100 * curves['CumulativeHours']
+                             / curves['BudgetHours'].where(curves['BudgetHours'] > 0)).round(1)
+    return curves
+
+
+def budgeted_jobs():
+    """ProductionControlIDs of every job with an estimate budget."""
+    jobs = run_query("SELECT ProductionControlID FROM productioncontroljobs WHERE TotalManHours > 0")
+    return [] if jobs is None else jobs['ProductionControlID'].tolist()
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--job', type=int, nargs='+', help='default: every job with a budget')
+    parser.add_argument('--by-station', action='store_true')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    curves = burn_curves(args.job or budgeted_jobs(), by_station=args.by_station)
+    print(f"{len(curves)} curve points in {time.perf_counter() - started:.1f}s")
+
+    keys = ['ProductionControlID', 'StationID'] if args.by_station else ['ProductionControlID']
+    summary = curves.groupby(keys).agg(
+        First=('Day', 'min'), Last=('Day', 'max'), Days=('Day', 'count'),
+        Hours=('CumulativeHours', 'last'), Budget=('BudgetHours', 'last'), Pct=('PctOfBudget', 'last'),
+    ).reset_index()
+    print(f"  {'Job':>6} {'Station':>8} {'First':>11} {'Last':>11} {'Days':>5} {'Hours':>10} {'Budget':>10} {'%':>7}")
+    for r in summary.itertuples(index=False):
+        station = str(r.StationID) if args.by_station else ''
+        print(f"  {r.ProductionControlID:>6} {station:>8} {str(r.First)[:10]:>11} {str(r.Last)[:10]:>11} "
+              f"{r.Days:>5} {r.Hours:>10.1f} {r.Budget:>10.1f} {r.Pct:>7.1f}")
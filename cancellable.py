@@ -0,0 +1,154 @@
+"""
+CANCELLABLE QUERIES - READ-ONLY
+Client-side deadlines and Ctrl-C handling that also stop the statement on
+the server.
+
+Interrupting Python only abandons the socket - MySQL keeps executing the
+query. Here the statement runs on a worker thread while the calling thread
+waits. When the deadline passes (or Ctrl-C arrives) a short-lived side
+connection issues KILL QUERY <connection_id>, the worker receives
+"Query execution was interrupted", leftover results are drained and the
+connection goes back to its pool usable. KILL QUERY leaves the session
+open, so nothing has to reconnect.
+
+Usage:
+    from cancellable import CancellableCursor, run_query
+    cursor = CancellableCursor(conn, timeout=120)    # in place of conn.cursor()
+    df = run_query(sql, timeout=60)                  # like powerfab_db.run_query
+"""
+import os
+import threading
+import time
+
+import mysql.connector
+
+from powerfab_db import DB_CONFIG, get_connection, rows_to_frame
+
+DEFAULT_TIMEOUT = float(os.getenv('POWERFAB_QUERY_TIMEOUT', 300))
+POLL_INTERVAL = 0.2
+
+
+class QueryTimeout(Exception):
+    """Raised when a query was killed after passing its deadline."""
+
+
+def kill_query(connection_id, config=None):
+    """Stop the statement running on another connection (the session stays open)."""
+    side = mysql.connector.connect(**(config or DB_CONFIG))
+    try:
+        cursor = side.cursor()
+        cursor.execute(f"KILL QUERY {int(connection_id)}")
+        cursor.close()
+    except mysql.connector.Error as err:
+        # Unknown thread id: it finished between the deadline and the KILL
+        if err.errno != 1094:
+            raise
+    finally:
+        side.close()
+
+
+def drain(conn):
+    """Discard unread results so the connection can be reused or reset."""
+    try:
+        if conn.unread_result:
+            conn.consume_results()
+    except mysql.connector.Error:
+        pass
+
+
+def run_cancellable(conn, work, timeout=DEFAULT_TIMEOUT, config=None):
+    """
+    Run work() (which uses conn) with a deadline, killing it server-side on
+    timeout or Ctrl-C.
+
+    Args:
+        conn: Connection the work runs on (pooled or plain)
+        work: Callable doing the execute/fetch
+        timeout: Seconds, None for no deadline (Ctrl-C still cancels)
+        config: Settings for the side connection, defaults to DB_CONFIG
+
+    Returns:
+        work()'s return value
+
+    Raises:
+        QueryTimeout: if the deadline passed
+        KeyboardInterrupt: re-raised after the server query was stopped
+    """
+    connection_id = conn.connection_id
+    outcome = {}
+
+    def target():
+        try:
+            outcome['value'] = work()
+        except BaseException as err:
+            outcome['error'] = err
+
+    worker = threading.Thread(target=target, daemon=True)
+    started = time.monotonic()
+    worker.start()
+    try:
+        while worker.is_alive():
+            remaining = None if timeout is None else timeout - (time.monotonic() - started)
+            if remaining is not None and remaining <= 0:
+                kill_query(connection_id, config)
+                worker.join()
+                drain(conn)
+                raise QueryTimeout(f"Query cancelled after {timeout:g}s (connection {connection_id})")
+            worker.join(POLL_INTERVAL if remaining is None else min(POLL_INTERVAL, remaining))
+    except KeyboardInterrupt:
+        kill_query(connection_id, config)
+        worker.join()
+        drain(conn)
+        raise
+
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['value']
+
+
+class CancellableCursor:
+    """
+    Buffered cursor whose execute() is cancellable.
+
+    Rows are fetched inside execute(), so fetchall()/fetchone() afterwards
+    never wait on the server. Other attributes pass through to the cursor.
+    """
+
+    def __init__(self, conn, timeout=DEFAULT_TIMEOUT, config=None):
+        self.conn = conn
+        self.timeout = timeout
+        self.config = config
+        self.cursor = conn.cursor(buffered=True)
+
+    def execute(self, sql, params=None, timeout=None):
+        return run_cancellable(self.conn, lambda: self.cursor.execute(sql, params),
+                               timeout or self.timeout, self.config)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def run_query(query, params=None, pool_name='powerfab', timeout=DEFAULT_TIMEOUT):
+    """
+    Execute a SQL query with a deadline and return results as a DataFrame.
+
+    Returns:
+        pandas DataFrame, or None on database error or timeout (the reason
+        is printed, like powerfab_db.run_query)
+    """
+    try:
+        conn = get_connection(pool_name)
+        try:
+            cursor = CancellableCursor(conn, timeout)
+            cursor.execute(query, params)
+            df = rows_to_frame(cursor, cursor.fetchall())
+            cursor.close()
+        finally:
+            conn.close()
+        return df
+    except QueryTimeout as err:
+        print(f"Query timeout: {err}")
+        return None
+    except mysql.connector.Error as err:
+        print(f"Database error: {err}")
+        return None
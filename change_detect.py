@@ -0,0 +1,135 @@
+"""
+CHUNK-CHECKSUM CHANGE DETECTION - READ-ONLY
+Incremental refresh for tables without a trustworthy last-modified column
+(estimateitems, estimateitemlaborgroups, ...).
+
+The key space is cut into fixed-width chunks (FLOOR(key / width)). One
+server-side query returns COUNT(*) and an order-independent 64-bit checksum
+(BIT_XOR of the first 16 hex digits of each row's MD5) per chunk. Those
+checksums are compared with the ones stored next to the local snapshot, and
+only the chunks that differ are re-fetched and spliced into the snapshot.
+A table with a few hundred edits moves the checksum list plus a few chunks.
+
+Usage:
+    python change_detect.py estimateitemlaborgroups [estimateitems ...] [--workers N]
+"""
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from arrow_cache import load_manifest, open_table, write_snapshot
+from parallel_extract import extract_ranges
+from powerfab_db import get_connection, table_columns
+from schema_graph import PRIMARY_KEYS
+
+DEFAULT_CHUNK_WIDTH = 5000
+CHUNK_WIDTH = {
+    # ~8 rows per item - keep chunks around the same row count as the others
+    'estimateitemlaborgroups': 1000,
+}
+
+
+def checksum_sql(table, key, columns, width):
+    # NULL is spelled out so that NULL and '' hash differently
+    values = ", ".join(f"COALESCE(`{c}`, '\\\\N')" for c in columns)
+    row_hash = f"CAST(CONV(SUBSTRING(MD5(CONCAT_WS('|', {values})), 1, 16), 16, 10) AS UNSIGNED)"
+    return f"""
+        SELECT FLOOR(`{key}` / {int(width)}) as Chunk, COUNT(*) as NumRows, BIT_XOR({row_hash}) as Checksum
+        FROM `{table}`
+        GROUP BY Chunk
+    """
+
+
+def server_checksums(table, columns, width, key=None):
+    """
+    Returns:
+        dict of chunk number -> [row count, checksum]
+    """
+    key = key or PRIMARY_KEYS[table]
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(checksum_sql(table, key, columns, width))
+        checksums = {int(chunk): [int(rows), int(checksum)] for chunk, rows, checksum in cursor.fetchall()}
+        cursor.close()
+    finally:
+        conn.close()
+    return checksums
+
+
+def splice(local, fresh_batches, chunks, key, width):
+    """
+    Replace the rows of the given chunks in the local table with fresh rows.
+
+    Returns:
+        pyarrow Table sorted by key
+    """
+    chunk_of = pc.divide(local[key].cast(pa.int64()), pa.scalar(width, pa.int64()))
+    keep = pc.invert(pc.is_in(chunk_of, value_set=pa.array(sorted(chunks), pa.int64())))
+    parts = [local.filter(keep)] + [pa.Table.from_batches([b]) for b in fresh_batches]
+    merged = pa.concat_tables(parts, promote_options='default')
+    return merged.sort_by(key)
+
+
+def sync_table(table, workers=4):
+    """
+    Bring a snapshot table up to date by re-fetching changed chunks only.
+
+    The first run (no stored checksums) extracts every chunk.
+
+    Returns:
+        dict with chunks checked/changed, rows re-fetched and seconds taken
+    """
+    started = time.perf_counter()
+    key = PRIMARY_KEYS[table]
+    width = CHUNK_WIDTH.get(table, DEFAULT_CHUNK_WIDTH)
+    columns = table_columns(table)
+    # Checksums first: anything edited during the fetch shows up as a
+    # difference next time rather than being missed
+    current = server_checksums(table, columns, width, key)
+
+    entry = load_manifest().get(table, {})
+    stored = {int(k): v for k, v in entry.get('checksums', {}).items()}
+    full = not stored or entry.get('chunk_width') != width or entry.get('columns') != columns
+    if full:
+        changed = set(current)
+    else:
+        changed = {c for c in current.keys() | stored.keys() if current.get(c) != stored.get(c)}
+
+    ranges = [(c * width, (c + 1) * width) for c in sorted(changed) if c in current]
+    batches = extract_ranges(table, ranges, workers, columns=[f"`{c}`" for c in columns], key=key)
+    if full:
+        data = pa.Table.from_batches(batches) if batches else pa.table({})
+    elif changed:
+        data = splice(open_table(table), batches, changed, key, width)
+    else:
+        data = None
+
+    if data is not None:
+        write_snapshot(table, data, entry.get('format'), checksums=current, chunk_width=width, columns=columns)
+    return {
+        'table': table,
+        'chunks': len(current),
+        'changed': len(changed),
+        'rows_fetched': sum(b.num_rows for b in batches),
+        'full': full,
+        'seconds': round(time.perf_counter() - started, 1),
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('tables', nargs='+')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"  {'Table':<30} {'Chunks':>7} {'Changed':>8} {'Rows':>9} {'Secs':>6}")
+    for table in args.tables:
+        r = sync_table(table, workers=args.workers)
+        note = " (full)" if r['full'] else ""
+        print(f"  {table:<30} {r['chunks']:>7} {r['changed']:>8} {r['rows_fetched']:>9} {r['seconds']:>6}{note}")
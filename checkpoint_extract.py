@@ -0,0 +1,251 @@
+"""
+CHECKPOINTED TABLE EXTRACTION - READ-ONLY
+Pulls multi-million-row tables (estimateitemlaborgroups, ...) over a slow or
+flaky link without starting over when the connection drops.
+
+The table is read in unique-key order, CHUNK_ROWS rows at a time:
+
+    SELECT ... WHERE (k1, k2) > (<last committed key>) ORDER BY k1, k2 LIMIT n
+
+The key must be unique - a composite key such as estimateitemlaborgroups'
+(EstimateItemID, LaborGroupID) is paged on all of its columns (see
+schema_graph.UNIQUE_KEYS), or a chunk boundary inside one item's rows would
+drop the rest of them.
+
+Each chunk is written to local_data/checkpoints/<table>/part-NNNNN.arrow and
+only then is the checkpoint file (last key, parts, rows) replaced, so the
+checkpoint never points past data that is on disk. A dropped connection is
+retried with exponential backoff; if the retries run out the run stops, and
+the next run continues after the last committed key - no row is fetched
+twice or skipped, and at most one chunk is lost.
+
+Rows inserted behind the last committed key while an extraction is paused are
+not picked up (same as any key-range read); rerun with --restart for a fresh
+copy. When the end of the table is reached the parts are assembled into one
+Feather file (or published to the snapshot with --snapshot) and the
+checkpoint directory is removed.
+
+Usage:
+    python checkpoint_extract.py estimateitemlaborgroups [--chunk-rows N] [--snapshot]
+    python checkpoint_extract.py estimateitemlaborgroups --restart
+"""
+import json
+import os
+import shutil
+import time
+
+import mysql.connector
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from fast_fetch import decode_rows
+from powerfab_db import get_pool, local_path
+from schema_graph import PRIMARY_KEYS, UNIQUE_KEYS
+
+CHECKPOINT_DIR = 'checkpoints'
+CHECKPOINT_FILE = 'checkpoint.json'
+CHUNK_ROWS = 200_000
+RETRIES = 8
+MAX_BACKOFF = 60
+EXTRACT_POOL = 'checkpoint_extract'
+
+
+def checkpoint_path(table, *parts):
+    return local_path(CHECKPOINT_DIR, table, *parts)
+
+
+def load_checkpoint(table):
+    path = checkpoint_path(table, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_checkpoint(table, checkpoint):
+    tmp = checkpoint_path(table, CHECKPOINT_FILE + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp, checkpoint_path(table, CHECKPOINT_FILE))
+
+
+def clear_checkpoint(table):
+    shutil.rmtree(local_path(CHECKPOINT_DIR, table), ignore_errors=True)
+
+
+def unique_key(table, key=None):
+    """Key columns (a list) that identify a row of the table."""
+    if key is None:
+        return UNIQUE_KEYS.get(table, [PRIMARY_KEYS[table]])
+    return [key] if isinstance(key, str) else list(key)
+
+
+def fetch_chunk(table, key, columns, where, after, limit):
+    """
+    Fetch the next `limit` rows with (key columns) > after, in key order.
+
+    Args:
+        key: List of key columns
+        after: List of key values of the last row already fetched, or None
+
+    Returns:
+        pyarrow RecordBatch, or None past the end of the table
+    """
+    select = ", ".join(columns) if columns else "*"
+    filters = [f"{where}"] if where else []
+    if after is not None:
+        # Row comparison: resumes inside a run of equal leading-key values
+        filters.insert(0, f"({', '.join(key)}) > ({', '.join(['%s'] * len(key))})")
+    where_sql = f"WHERE {' AND '.join(f'({f})' for f in filters)}" if filters else ""
+    sql = f"SELECT {select} FROM {table} {where_sql} ORDER BY {', '.join(key)} LIMIT {int(limit)}"
+    params = tuple(after) if after is not None else ()
+
+    conn = get_pool(EXTRACT_POOL, size=1).get_connection()
+    try:
+        cursor = conn.cursor(raw=True)
+        cursor.execute(sql, params)
+        description = cursor.description
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
+    if not rows:
+        return None
+    return pa.RecordBatch.from_arrays(
+        decode_rows(description, rows), names=[desc[0] for desc in description]
+    )
+
+
+def fetch_with_retry(table, key, columns, where, after, limit, retries=RETRIES):
+    """fetch_chunk, reconnecting with exponential backoff on connection errors."""
+    for attempt in range(retries + 1):
+        try:
+            return fetch_chunk(table, key, columns, where, after, limit)
+        except mysql.connector.Error as err:
+            if attempt == retries:
+                raise
+            delay = min(MAX_BACKOFF, 2 ** attempt)
+            print(f"  {table}: {err} - retry {attempt + 1}/{retries} in {delay}s")
+            time.sleep(delay)
+
+
+def extract_chunks(table, key=None, columns=None, where=None, chunk_rows=CHUNK_ROWS,
+                   retries=RETRIES, restart=False):
+    """
+    Fetch a table chunk by chunk into checkpointed part files.
+
+    Args:
+        table: Table name
+        key: Unique key column or list of columns, defaults to
+            UNIQUE_KEYS[table] or PRIMARY_KEYS[table]
+        columns: Columns to fetch, defaults to all (the key is always included)
+        where: Optional SQL filter
+        chunk_rows: Rows per chunk - the most work a dropped connection costs
+        retries: Connection retries per chunk before giving up
+        restart: Discard an existing checkpoint instead of resuming it
+
+    Returns:
+        Checkpoint dict (complete=True once the end of the table is reached)
+    """
+    key = unique_key(table, key)
+    if columns:
+        columns = [k for k in key if k not in columns] + list(columns)
+    params = {'key': key, 'columns': columns, 'where': where}
+
+    if restart:
+        clear_checkpoint(table)
+    checkpoint = load_checkpoint(table)
+    if checkpoint and checkpoint['params'] != params:
+        raise ValueError(f"Checkpoint for {table} was started with {checkpoint['params']}; "
+                         f"rerun with restart=True (--restart) to discard it")
+    if checkpoint is None:
+        os.makedirs(checkpoint_path(table), exist_ok=True)
+        checkpoint = {'params': params, 'last_key': None, 'parts': [], 'rows': 0,
+                      'complete': False, 'started': time.strftime('%Y-%m-%d %H:%M:%S')}
+        save_checkpoint(table, checkpoint)
+    elif checkpoint['rows']:
+        print(f"  {table}: resuming after {tuple(key)} = {tuple(checkpoint['last_key'])} "
+              f"({checkpoint['rows']} rows in {len(checkpoint['parts'])} parts)")
+
+    while not checkpoint['complete']:
+        batch = fetch_with_retry(table, key, columns, where, checkpoint['last_key'], chunk_rows, retries)
+        if batch is None or batch.num_rows < chunk_rows:
+            checkpoint['complete'] = True
+        if batch is not None:
+            if pa.Table.from_batches([batch]).group_by(key).aggregate([]).num_rows < batch.num_rows:
+                raise ValueError(f"{tuple(key)} is not unique in {table}; pass the full key")
+            part = f"part-{len(checkpoint['parts']):05d}.arrow"
+            tmp = checkpoint_path(table, part + '.tmp')
+            feather.write_feather(pa.Table.from_batches([batch]), tmp, compression='uncompressed')
+            os.replace(tmp, checkpoint_path(table, part))
+            checkpoint['parts'].append(part)
+            checkpoint['rows'] += batch.num_rows
+            checkpoint['last_key'] = [batch.column(k)[-1].as_py() for k in key]
+        checkpoint['updated'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        save_checkpoint(table, checkpoint)
+        if batch is not None:
+            print(f"  {table}: {checkpoint['rows']} rows (up to {tuple(checkpoint['last_key'])})")
+    return checkpoint
+
+
+def assemble(table, checkpoint):
+    """Concatenate the committed parts into one pyarrow Table."""
+    parts = [feather.read_table(checkpoint_path(table, part)) for part in checkpoint['parts']]
+    if not parts:
+        return pa.table({})
+    return pa.concat_tables(parts)
+
+
+def extract_table(table, key=None, columns=None, where=None, chunk_rows=CHUNK_ROWS,
+                  retries=RETRIES, restart=False, out=None, snapshot=False):
+    """
+    Resumable whole-table extraction.
+
+    Args:
+        table, key, columns, where, chunk_rows, retries, restart: see extract_chunks
+        out: Feather file to write, defaults to local_data/extract/<table>.feather
+        snapshot: Publish to the local snapshot (arrow_cache) instead of a file
+
+    Returns:
+        pyarrow Table
+
+    Raises:
+        mysql.connector.Error when a chunk still fails after the retries; the
+        checkpoint is kept and the next call resumes from it
+    """
+    checkpoint = extract_chunks(table, key, columns, where, chunk_rows, retries, restart)
+    data = assemble(table, checkpoint)
+    if snapshot:
+        from arrow_cache import write_snapshot
+        write_snapshot(table, data)
+    else:
+        feather.write_feather(data, out or local_path('extract', f'{table}.feather'))
+    clear_checkpoint(table)
+    return data
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('table')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--retries', type=int, default=RETRIES)
+    parser.add_argument('--where', help='SQL filter applied to the table')
+    parser.add_argument('--restart', action='store_true', help='discard an existing checkpoint')
+    parser.add_argument('--snapshot', action='store_true', help='publish to the local snapshot')
+    parser.add_argument('--out', help='Feather file to write (default local_data/extract/<table>.feather)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        result = extract_table(args.table, where=args.where, chunk_rows=args.chunk_rows,
+                               retries=args.retries, restart=args.restart, out=args.out,
+                               snapshot=args.snapshot)
+    except mysql.connector.Error as err:
+        print(f"\nStopped: {err}\nProgress is checkpointed - rerun the same command to resume.")
+        sys.exit(1)
+    print(f"  {args.table}: {result.num_rows} rows, {result.num_columns} columns "
+          f"in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,267 @@
+"""
+ESTIMATE-AT-COMPLETION FORECAST - READ-ONLY
+Projects final hours and overrun risk for every open job at once, instead of
+only seeing estimated vs actual after the fact (Pattern 6).
+
+Per job (productioncontroljobs row):
+    BAC       budget hours         productioncontroljobs.TotalManHours
+    AC        hours burned so far  timerecords (Regular + OT + OT2)
+    Progress  earned fraction      station completions (sequence_progress)
+                                   weighted by estimated hours per labor
+                                   group over the job's full route
+    EV        earned hours         BAC * Progress
+    CPI       efficiency           EV / AC
+    EAC       projected final      AC + (BAC - EV) / CPI
+
+Both inputs are maintained incrementally: completions through
+SequenceProgress, burn as per-project sums of settled time records (key
+watermark) plus a small re-read tail starting at the oldest record still
+in progress.
+
+A job's route is every station mapped (stationlaborgroups) to a labor group
+the estimate has hours in (estimateitemlaborgroups), so stations the job has
+not reached yet count as 0% - not only the ones with completions. A labor
+group's completion is its furthest station's (a piece passing two stations
+of one group is done once), and groups are weighted by estimated hours.
+Labor groups mapped to no station cannot be tracked and are left out.
+
+Usage:
+    python eac_forecast.py [--full]
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from powerfab_db import get_connection, local_path, restore_state, run_query, store_state
+from sequence_progress import SequenceProgress
+
+STATE_FILE = 'eac_burn.pkl'
+
+HOURS = "tr.RegularHours + tr.OvertimeHours + tr.Overtime2Hours"
+RISK_BINS = [-np.inf, 0, 10, 25, np.inf]
+RISK_LABELS = ['On budget', 'Watch', 'At risk', 'Critical']
+
+ROUTE_HOURS = """
+    SELECT pcj.ProductionControlID, eilg.LaborGroupID, SUM(eilg.ManHours) as Hours
+    FROM productioncontroljobs pcj
+    JOIN estimateitems ei ON ei.EstimateID = pcj.EstimateID
+    JOIN estimateitemlaborgroups eilg ON eilg.EstimateItemID = ei.EstimateItemID
+    WHERE pcj.TotalManHours > 0
+    GROUP BY pcj.ProductionControlID, eilg.LaborGroupID
+    HAVING SUM(eilg.ManHours) > 0
+"""
+
+
+class BurnTracker:
+    """Actual hours per ProjectID, refreshed from the tail of timerecords."""
+
+    def __init__(self):
+        self.settled = {}     # ProjectID -> hours from records that can no longer change
+        self.watermark = 0    # highest TimeRecordID included in settled
+
+    @classmethod
+    def load(cls):
+        tracker = cls()
+        restore_state(tracker, STATE_FILE)
+        return tracker
+
+    def save(self):
+        store_state(self, STATE_FILE)
+
+    def _sums(self, cursor, lo, hi=None):
+        where = "tr.TimeRecordID > %s"
+        params = [lo]
+        if hi is not None:
+            where += " AND tr.TimeRecordID <= %s"
+            params.append(hi)
+        cursor.execute(f"""
+            SELECT tr.ProjectID, SUM(COALESCE({HOURS}, 0))
+            FROM timerecords tr
+            WHERE {where} AND tr.ProjectID IS NOT NULL
+            GROUP BY tr.ProjectID
+        """, params)
+        return {project: float(hours or 0) for project, hours in cursor.fetchall()}
+
+    def refresh(self):
+        """
+        Returns:
+            dict of ProjectID -> hours burned to date
+        """
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT MIN(CASE WHEN InProgress = 1 THEN TimeRecordID END), MAX(TimeRecordID)
+                FROM timerecords
+                WHERE TimeRecordID > %s
+            """, (self.watermark,))
+            first_open, max_id = cursor.fetchone()
+            if max_id is not None:
+                # Everything before the oldest open record is final
+                limit = first_open - 1 if first_open is not None else max_id
+                for project, hours in self._sums(cursor, self.watermark, limit).items():
+                    self.settled[project] = self.settled.get(project, 0.0) + hours
+                self.watermark = max(self.watermark, limit)
+            tail = self._sums(cursor, self.watermark)
+            cursor.close()
+        finally:
+            conn.close()
+        self.save()
+
+        burn = dict(self.settled)
+        for project, hours in tail.items():
+            burn[project] = burn.get(project, 0.0) + hours
+        return burn
+
+
+def job_routes():
+    """
+    Estimated hours per (job, labor group) with the stations doing that work.
+
+    Returns:
+        DataFrame with ProductionControlID, LaborGroupID, StationID, Hours
+    """
+    hours = run_query(ROUTE_HOURS)
+    mapping = run_query("SELECT StationID, LaborGroupID FROM stationlaborgroups")
+    if hours is None or mapping is None:
+        # run_query has already printed the database error
+        raise RuntimeError("Could not load estimated labor hours or the station mapping")
+    hours = pd.DataFrame({
+        'ProductionControlID': hours['ProductionControlID'].astype('float64'),
+        'LaborGroupID': hours['LaborGroupID'].astype('float64'),
+        'Hours': hours['Hours'].astype('float64'),
+    })
+    mapping = pd.DataFrame({
+        'StationID': mapping['StationID'].astype('float64'),
+        'LaborGroupID': mapping['LaborGroupID'].astype('float64'),
+    }).dropna()
+    return hours.merge(mapping, on='LaborGroupID', how='inner')
+
+
+def station_completion(progress):
+    """
+    Completed fraction of each job's required pieces per station.
+
+    Returns:
+        Series indexed by (ProductionControlID, StationID)
+    """
+    required = {}
+    for seq_id, (job_id, _, _) in progress.sequences.items():
+        required[job_id] = required.get(job_id, 0.0) + progress.seq_quantity.get(seq_id, 0.0)
+    completed = {}
+    for (seq_id, station_id), done in progress.completed.items():
+        if seq_id not in progress.sequences:
+            continue
+        job_id = progress.sequences[seq_id][0]
+        key = (float(job_id), float(station_id))
+        completed[key] = completed.get(key, 0.0) + min(done, progress.seq_quantity.get(seq_id, 0.0))
+    return pd.Series({key: done / required[key[0]] for key, done in completed.items()
+                      if required.get(key[0], 0) > 0}, dtype='float64')
+
+
+def job_progress(progress, routes):
+    """
+    Earned fraction per ProductionControlID over the job's full route.
+
+    Args:
+        progress: SequenceProgress with current completion counters
+        routes: job_routes() frame
+
+    Returns:
+        Series of earned fraction indexed by ProductionControlID
+    """
+    if routes.empty:
+        return pd.Series(dtype='float64', name='Progress')
+    done = station_completion(progress)
+    routes = routes.copy()
+    keys = pd.MultiIndex.from_frame(routes[['ProductionControlID', 'StationID']])
+    routes['Fraction'] = done.reindex(keys).fillna(0.0).clip(0, 1).to_numpy()
+    groups = routes.groupby(['ProductionControlID', 'LaborGroupID']).agg(
+        Hours=('Hours', 'first'), Fraction=('Fraction', 'max'))
+    groups['Earned'] = groups['Hours'] * groups['Fraction']
+    totals = groups.groupby('ProductionControlID')[['Hours', 'Earned']].sum()
+    return (totals['Earned'] / totals['Hours'].where(totals['Hours'] > 0)).rename('Progress')
+
+
+def forecast(jobs, burn, progress):
+    """
+    Vectorized EAC for all jobs.
+
+    Args:
+        jobs: DataFrame with ProductionControlID, ProjectID, JobNumber,
+            JobDescription and TotalManHours
+        burn: dict of ProjectID -> actual hours
+        progress: Series of earned fraction indexed by ProductionControlID
+
+    Returns:
+        DataFrame with BAC, AC, Progress, EV, CPI, EAC, ProjectedVariance,
+        ProjectedOverrunPct and Risk per job, worst first
+    """
+    df = jobs.copy()
+    df['BAC'] = df['TotalManHours'].astype('float64')
+    df['AC'] = df['ProjectID'].map(burn).astype('float64').fillna(0.0)
+    df['Progress'] = df['ProductionControlID'].map(progress).astype('float64').fillna(0.0).clip(0, 1)
+    df['EV'] = df['BAC'] * df['Progress']
+    df['CPI'] = df['EV'] / df['AC'].where(df['AC'] > 0)
+
+    remaining = (df['BAC'] - df['EV']) / df['CPI']
+    # No earned progress yet: nothing to project from, assume at least the budget
+    no_evidence = df['CPI'].isna() | (df['CPI'] <= 0)
+    df['EAC'] = np.where(no_evidence, np.maximum(df['BAC'], df['AC']), df['AC'] + remaining)
+    df['ProjectedVariance'] = df['EAC'] - df['BAC']
+    df['ProjectedOverrunPct'] = (100 * (df['EAC'] / df['BAC'].where(df['BAC'] > 0) - 1)).round(1)
+    df['Risk'] = pd.cut(df['ProjectedOverrunPct'], RISK_BINS, labels=RISK_LABELS)
+    return df.sort_values('ProjectedVariance', ascending=False).reset_index(drop=True)
+
+
+def portfolio_forecast(include_complete=False):
+    """
+    Refresh the incremental inputs and forecast every job with a budget.
+
+    Args:
+        include_complete: Keep jobs whose tracked progress is already 100%
+
+    Returns:
+        DataFrame (see forecast)
+    """
+    jobs = run_query("""
+        SELECT pcj.ProductionControlID, pcj.ProjectID, pcj.JobNumber,
+               p.JobDescription, pcj.TotalManHours
+        FROM productioncontroljobs pcj
+        LEFT JOIN projects p ON p.ProjectID = pcj.ProjectID
+        WHERE pcj.TotalManHours > 0
+    """)
+    if jobs is None:
+        # run_query has already printed the database error
+        raise RuntimeError("Could not load jobs from productioncontroljobs")
+    completions = SequenceProgress.load()
+    completions.refresh()
+    result = forecast(jobs, BurnTracker.load().refresh(), job_progress(completions, job_routes()))
+    if not include_complete:
+        result = result[result['Progress'] < 1].reset_index(drop=True)
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--full', action='store_true', help='rebuild burn totals from scratch')
+    args = parser.parse_args()
+    if args.full and os.path.exists(local_path(STATE_FILE)):
+        os.remove(local_path(STATE_FILE))
+
+    started = time.perf_counter()
+    result = portfolio_forecast()
+    print("=" * 110)
+    print(f"ESTIMATE AT COMPLETION - {len(result)} open jobs ({time.perf_counter() - started:.1f}s)")
+    print("=" * 110)
+    print(f"  {'Job#':>10} {'Description':<30} {'BAC':>9} {'AC':>9} {'Prog%':>6} {'CPI':>6} {'EAC':>9} {'Over%':>7}  Risk")
+    for r in result.itertuples():
+        cpi = f"{r.CPI:.2f}" if pd.notna(r.CPI) else ""
+        print(f"  {str(r.JobNumber):>10} {str(r.JobDescription or '')[:30]:<30} {r.BAC:>9.1f} {r.AC:>9.1f} "
+              f"{100 * r.Progress:>6.1f} {cpi:>6} {r.EAC:>9.1f} {r.ProjectedOverrunPct:>7.1f}  {r.Risk}")
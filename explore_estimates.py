@@ -75,7 +75,7 @@ subsection("4. Describe estimateitems")
 cursor.execute("""
     SELECT COLUMN_NAME, DATA_TYPE
     FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE TABLE_SCHEMA = 'fabrication'
+    WHERE TABLE_SCHEMA = DATABASE()
     AND TABLE_NAME = 'estimateitems'
 """)
 print("  All columns in estimateitems:")
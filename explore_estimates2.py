@@ -37,7 +37,7 @@ subsection("1. All columns in estimates table")
 cursor.execute("""
     SELECT COLUMN_NAME
     FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE TABLE_SCHEMA = 'fabrication'
+    WHERE TABLE_SCHEMA = DATABASE()
     AND TABLE_NAME = 'estimates'
 """)
 print("  Columns in estimates:")
@@ -59,7 +59,7 @@ subsection("3. estimateitems - Piece level estimates")
 cursor.execute("""
     SELECT COLUMN_NAME
     FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE TABLE_SCHEMA = 'fabrication'
+    WHERE TABLE_SCHEMA = DATABASE()
     AND TABLE_NAME = 'estimateitems'
     ORDER BY COLUMN_NAME
 """)
@@ -10,6 +10,8 @@ import mysql.connector
 from dotenv import load_dotenv
 import os
 
+from cancellable import CancellableCursor
+
 load_dotenv()
 
 DB_CONFIG = {
@@ -23,7 +25,8 @@ DB_CONFIG = {
 }
 
 conn = mysql.connector.connect(**DB_CONFIG)
-cursor = conn.cursor()
+# Ctrl-C or a query running past POWERFAB_QUERY_TIMEOUT also stops it on the server
+cursor = CancellableCursor(conn, config=DB_CONFIG)
 
 def section(title):
     print("\n" + "=" * 75)
@@ -242,7 +245,7 @@ subsection("3.5 Looking for estimate-to-job linkage")
 cursor.execute("""
     SELECT TABLE_NAME, COLUMN_NAME
     FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE TABLE_SCHEMA = 'fabrication'
+    WHERE TABLE_SCHEMA = DATABASE()
     AND (COLUMN_NAME LIKE '%EstimateID%' OR COLUMN_NAME LIKE '%EstimatingJob%')
     AND TABLE_NAME NOT LIKE '%log'
     LIMIT 30
@@ -304,7 +307,7 @@ subsection("4.1 How Projects link to Estimates")
 cursor.execute("""
     SELECT COLUMN_NAME
     FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE TABLE_SCHEMA = 'fabrication'
+    WHERE TABLE_SCHEMA = DATABASE()
     AND TABLE_NAME = 'projects'
     AND (COLUMN_NAME LIKE '%estim%' OR COLUMN_NAME LIKE '%job%')
 """)
@@ -322,7 +325,7 @@ subsection("4.3 Looking for EstimatingJobID connections")
 cursor.execute("""
     SELECT TABLE_NAME, COLUMN_NAME
     FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE TABLE_SCHEMA = 'fabrication'
+    WHERE TABLE_SCHEMA = DATABASE()
     AND COLUMN_NAME = 'EstimatingJobID'
     AND TABLE_NAME NOT LIKE '%log'
     LIMIT 20
@@ -336,7 +339,7 @@ try:
     cursor.execute("""
         SELECT COLUMN_NAME
         FROM INFORMATION_SCHEMA.COLUMNS
-        WHERE TABLE_SCHEMA = 'fabrication'
+        WHERE TABLE_SCHEMA = DATABASE()
         AND TABLE_NAME = 'estimates'
     """)
     print("  All columns in estimates:")
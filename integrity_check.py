@@ -0,0 +1,196 @@
+"""
+REFERENTIAL INTEGRITY CHECK - READ-ONLY
+The schema has no foreign key constraints, so nothing stops orphaned rows.
+Each inferred relationship from powerfab-table-relationships.md is checked
+with a single anti-join; checks run in parallel on pooled connections.
+
+After the first full pass only rows above the stored key watermark (newly
+synced rows) are checked. The watermark is the child's unique key -
+composite keys from schema_graph.UNIQUE_KEYS are compared as a row - so
+a batch boundary inside one parent's rows skips nothing. Use --full to
+re-baseline, e.g. after parent rows were deleted.
+
+Usage:
+    python integrity_check.py [--full] [--workers N] [--samples N]
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from powerfab_db import get_pool, local_path
+from schema_graph import PRIMARY_KEYS, UNIQUE_KEYS, load_relationships
+
+STATE_FILE = 'integrity_state.json'
+INTEGRITY_POOL = 'integrity'
+
+
+def relationship_key(rel):
+    child, child_col, parent, parent_col = rel[:4]
+    return f"{child}.{child_col}->{parent}.{parent_col}"
+
+
+def load_state():
+    path = local_path(STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state):
+    with open(local_path(STATE_FILE), 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, default=str)
+
+
+def child_key(child):
+    """Key columns (a list) that identify a row of the child table."""
+    return UNIQUE_KEYS.get(child, [PRIMARY_KEYS[child]])
+
+
+def check_relationship(rel, watermark=None, samples=5, pool_name=INTEGRITY_POOL):
+    """
+    Count orphans for one relationship with one anti-join.
+
+    Args:
+        rel: (child_table, child_column, parent_table, parent_column, meaning)
+        watermark: Only check child rows with key above this value - a list
+            of key values, compared as a row so composite keys such as
+            estimateitemlaborgroups' (EstimateItemID, LaborGroupID) resume
+            inside a run of equal leading values
+        samples: Number of orphaned child keys to return
+
+    Returns:
+        dict with orphan count, sample child keys, checked rows and the new
+        watermark (highest child key seen)
+    """
+    child, child_col, parent, parent_col = rel[:4]
+    key = child_key(child)
+    if watermark is not None and not isinstance(watermark, list):
+        watermark = [watermark]
+    if watermark is not None and len(watermark) != len(key):
+        # Stored under a different key - check the table in full once
+        watermark = None
+    key_cols = ", ".join(f"c.{k}" for k in key)
+    where = [f"c.{child_col} IS NOT NULL"]
+    params = []
+    if watermark is not None:
+        where.append(f"({key_cols}) > ({', '.join(['%s'] * len(key))})")
+        params.extend(watermark)
+    where_sql = " AND ".join(where)
+
+    started = time.perf_counter()
+    conn = get_pool(pool_name).get_connection()
+    try:
+        cursor = conn.cursor()
+        # New watermark first, then check only up to it, so rows synced
+        # while the check runs are left for the next pass rather than skipped
+        cursor.execute(f"""
+            SELECT {key_cols}
+            FROM {child} c
+            WHERE {where_sql}
+            ORDER BY {', '.join(f'c.{k} DESC' for k in key)}
+            LIMIT 1
+        """, params)
+        row = cursor.fetchone()
+        max_key = list(row) if row else None
+        orphans = checked = 0
+        if max_key is not None:
+            where_sql += f" AND ({key_cols}) <= ({', '.join(['%s'] * len(key))})"
+            params.extend(max_key)
+            cursor.execute(f"""
+                SELECT
+                    SUM(p.{parent_col} IS NULL) as Orphans,
+                    COUNT(*) as Checked
+                FROM {child} c
+                LEFT JOIN {parent} p ON c.{child_col} = p.{parent_col}
+                WHERE {where_sql}
+            """, params)
+            orphans, checked = cursor.fetchone()
+
+        sample_rows = []
+        if orphans:
+            cursor.execute(f"""
+                SELECT {key_cols}, c.{child_col}
+                FROM {child} c
+                LEFT JOIN {parent} p ON c.{child_col} = p.{parent_col}
+                WHERE {where_sql} AND p.{parent_col} IS NULL
+                LIMIT {int(samples)}
+            """, params)
+            sample_rows = [list(row) for row in cursor.fetchall()]
+        cursor.close()
+    finally:
+        conn.close()
+
+    return {
+        'relationship': relationship_key(rel),
+        'meaning': rel[4],
+        'orphans': int(orphans or 0),
+        'checked': int(checked or 0),
+        'samples': sample_rows,
+        'watermark': max_key if max_key is not None else watermark,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+def check_integrity(full=False, workers=4, samples=5):
+    """
+    Check every inferred relationship, in parallel.
+
+    Args:
+        full: Ignore stored watermarks and check all rows
+        workers: Number of checks running at once (and pool size)
+        samples: Orphaned keys to keep per relationship
+
+    Returns:
+        list of result dicts (see check_relationship) with orphan totals
+        accumulated across incremental passes
+    """
+    relationships = load_relationships()
+    state = {} if full else load_state()
+    get_pool(INTEGRITY_POOL, size=workers)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for rel in relationships:
+            previous = state.get(relationship_key(rel), {})
+            futures.append(pool.submit(
+                check_relationship, rel, previous.get('watermark'), samples
+            ))
+        results = [future.result() for future in futures]
+
+    for result in results:
+        previous = state.get(result['relationship'], {})
+        result['new_orphans'] = result['orphans']
+        result['orphans'] += previous.get('orphans', 0)
+        result['samples'] = (previous.get('samples', []) + result['samples'])[-samples:]
+        state[result['relationship']] = {
+            key: result[key] for key in ('watermark', 'orphans', 'samples')
+        }
+    save_state(state)
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--full', action='store_true', help='ignore watermarks and check all rows')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--samples', type=int, default=5)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = check_integrity(full=args.full, workers=args.workers, samples=args.samples)
+
+    print("=" * 100)
+    print(f"REFERENTIAL INTEGRITY CHECK ({'FULL' if args.full else 'INCREMENTAL'}, READ-ONLY)")
+    print("=" * 100)
+    print(f"  {'Relationship':<70} {'Checked':>9} {'New':>6} {'Orphans':>8} {'Secs':>6}")
+    for r in sorted(results, key=lambda r: -r['orphans']):
+        print(f"  {r['relationship']:<70} {r['checked']:>9} {r['new_orphans']:>6} {r['orphans']:>8} {r['seconds']:>6}")
+        if r['samples']:
+            print(f"      sample (key, missing value): {r['samples']}")
+    print(f"\n  Done in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,183 @@
+"""
+FAN-OUT-SAFE QUERY BUILDER
+Builds SQL for "measures by dimensions" from the documented relationship
+graph instead of hand-joining fact tables together.
+
+Joining timerecords, productioncontroljobs and estimateitems directly
+multiplies their rows (every time record repeats once per estimate item).
+Here each fact table is aggregated in its own subquery, joined only along
+its cheapest path to the dimension tables (many-to-one steps preferred),
+and the subqueries are combined on the dimension values afterwards. The
+work is bounded by the largest fact table, not the product of all of them.
+
+Example:
+    sql, params = build_query(
+        ['estimated_hours', 'actual_hours'],
+        ['laborgroups.Description'],
+        {'projects.JobNumber': '22039'},
+    )
+"""
+from sql_guard import run_query
+from schema_graph import adjacency, join_tree
+
+# measure -> (fact table, aggregate over that table's columns, alias 'f')
+MEASURES = {
+    'actual_hours': ('timerecords', 'SUM(f.RegularHours + f.OvertimeHours + f.Overtime2Hours)'),
+    'overtime_hours': ('timerecords', 'SUM(f.OvertimeHours + f.Overtime2Hours)'),
+    'time_entries': ('timerecords', 'COUNT(*)'),
+    'estimated_hours': ('estimateitemlaborgroups', 'SUM(f.ManHours)'),
+    'estimate_items': ('estimateitems', 'COUNT(*)'),
+    # ManHours is per piece (docs/schema_estimating.md)
+    'estimate_item_hours': ('estimateitems', 'SUM(f.ManHours * f.Quantity)'),
+    'budget_hours': ('productioncontroljobs', 'SUM(f.TotalManHours)'),
+    'pieces_completed': ('productioncontrolitemstations', 'SUM(f.Quantity)'),
+    'tracked_hours': ('productioncontrolitemstations', 'SUM(f.Hours)'),
+    'pieces_required': ('productioncontrolitems', 'SUM(f.Quantity)'),
+}
+
+
+def split_column(ref):
+    table, column = ref.split('.')
+    return table, column
+
+
+def output_names(dimensions):
+    """Column names for dimensions; table-qualified only when names clash."""
+    columns = [split_column(d)[1] for d in dimensions]
+    return [f"{t}_{c}" if columns.count(c) > 1 else c
+            for (t, c) in (split_column(d) for d in dimensions)]
+
+
+def fact_subquery(fact, measures, dimensions, filters, graph):
+    """
+    One pre-aggregated subquery for a fact table.
+
+    Returns:
+        (sql, params, fan_out_steps)
+    """
+    targets = []
+    for ref in list(dimensions) + list(filters):
+        table = split_column(ref)[0]
+        if table != fact and table not in targets:
+            targets.append(table)
+    steps = join_tree(fact, targets, graph)
+
+    aliases = {fact: 'f'}
+    joins = []
+    for i, (source, source_col, table, table_col, _) in enumerate(steps):
+        aliases[table] = f"j{i}"
+        # LEFT JOIN: facts with missing (orphaned) parents still count
+        joins.append(f"LEFT JOIN {table} j{i} ON {aliases[source]}.{source_col} = j{i}.{table_col}")
+
+    selects = [f"{aliases[t]}.{c} as d{i}" for i, (t, c) in
+               enumerate(split_column(d) for d in dimensions)]
+    selects += [f"{MEASURES[m][1]} as {m}" for m in measures]
+    where = []
+    params = []
+    for ref, value in filters.items():
+        table, column = split_column(ref)
+        if isinstance(value, (list, tuple)):
+            where.append(f"{aliases[table]}.{column} IN ({', '.join(['%s'] * len(value))})")
+            params.extend(value)
+        else:
+            where.append(f"{aliases[table]}.{column} = %s")
+            params.append(value)
+
+    sql = f"SELECT {', '.join(selects)}\n    FROM {fact} f"
+    if joins:
+        sql += "\n    " + "\n    ".join(joins)
+    if where:
+        sql += "\n    WHERE " + " AND ".join(where)
+    if dimensions:
+        sql += "\n    GROUP BY " + ", ".join(f"d{i}" for i in range(len(dimensions)))
+    fan_out = [f"{s[0]} -> {s[2]}" for s in steps if s[4]]
+    return sql, params, fan_out
+
+
+def build_query(measures, dimensions=(), filters=None):
+    """
+    Build fan-out-safe SQL for measures grouped by dimensions.
+
+    Args:
+        measures: Names from MEASURES
+        dimensions: 'table.column' references, e.g. 'stations.Description'
+        filters: dict of 'table.column' -> value (or list of values)
+
+    Returns:
+        (sql, params, warnings) - warnings list one-to-many steps a measure
+        had to cross (e.g. stations -> stationlaborgroups), where a value
+        can legitimately count toward more than one dimension member
+    """
+    filters = filters or {}
+    unknown = [m for m in measures if m not in MEASURES]
+    if unknown:
+        raise ValueError(f"Unknown measures: {unknown}. Known: {sorted(MEASURES)}")
+
+    by_fact = {}
+    for m in measures:
+        by_fact.setdefault(MEASURES[m][0], []).append(m)
+
+    graph = adjacency()
+    subqueries = []
+    params = []
+    warnings = []
+    for fact, fact_measures in by_fact.items():
+        sql, sub_params, fan_out = fact_subquery(fact, fact_measures, dimensions, filters, graph)
+        subqueries.append((sql, fact_measures))
+        params.extend(sub_params)
+        warnings.extend(f"{', '.join(fact_measures)} crosses {step}" for step in fan_out)
+
+    names = output_names(dimensions)
+    dim_count = len(dimensions)
+    if not dim_count:
+        froms = " CROSS JOIN ".join(f"(\n    {sql}\n) s{i}" for i, (sql, _) in enumerate(subqueries))
+        columns = [f"s{i}.{m}" for i, (_, ms) in enumerate(subqueries) for m in ms]
+        return f"SELECT {', '.join(columns)}\nFROM {froms}", params, warnings
+
+    # Every dimension combination any fact produced, then each fact LEFT JOINed on it
+    # (MySQL has no FULL OUTER JOIN). <=> so NULL dimension values still match.
+    dim_list = ", ".join(f"d{i}" for i in range(dim_count))
+    keys = "\n    UNION\n    ".join(f"SELECT {dim_list} FROM s{i}" for i in range(len(subqueries)))
+    ctes = ",\n".join(f"s{i} AS (\n    {sql}\n)" for i, (sql, _) in enumerate(subqueries))
+    columns = [f"k.d{i} as `{name}`" for i, name in enumerate(names)]
+    columns += [f"s{i}.{m}" for i, (_, ms) in enumerate(subqueries) for m in ms]
+    joins = "\n".join(
+        f"LEFT JOIN s{i} ON " + " AND ".join(f"k.d{j} <=> s{i}.d{j}" for j in range(dim_count))
+        for i in range(len(subqueries))
+    )
+    sql = (f"WITH {ctes},\nk AS (\n    {keys}\n)\n"
+           f"SELECT {', '.join(columns)}\nFROM k\n{joins}\nORDER BY {', '.join(f'`{n}`' for n in names)}")
+    return sql, params, warnings
+
+
+def query(measures, dimensions=(), filters=None, pool_name='powerfab', budget=None):
+    """
+    Build and run a query.
+
+    Args:
+        budget: Rows examined allowed by the guardrail, defaults to
+            sql_guard.ROW_BUDGET
+
+    Returns:
+        pandas DataFrame (None if rejected by the guardrail or on database error)
+    """
+    sql, params, warnings = build_query(measures, dimensions, filters)
+    for warning in warnings:
+        print(f"Note: {warning}")
+    return run_query(sql, tuple(params), pool_name, budget=budget)
+
+
+if __name__ == '__main__':
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    # Pattern 2 (estimated vs actual by labor group), without the fan-out
+    sql, params, warnings = build_query(
+        ['estimated_hours', 'actual_hours'],
+        ['laborgroups.Description'],
+        {'projects.JobNumber': sys.argv[1] if len(sys.argv) > 1 else '?'},
+    )
+    print(sql)
+    print(f"\n-- params: {params}")
+    for warning in warnings:
+        print(f"-- note: {warning}")
@@ -0,0 +1,284 @@
+"""
+HISTORICAL LABOR-RATE MODEL - READ-ONLY
+Actual hours per ton and per piece by labor group, shape and job size,
+learned from every produced job - the rates that feed back into estimating.
+
+Actual hours come from timerecords per (project, station). Each station's
+hours are spread over what the station produced for that project
+(productioncontrolitemstations completions, weighted by the piece weight
+from productioncontrolitems), then onto the station's labor groups through
+stationlaborgroups (hours split evenly when a station maps to several; a
+group's output is counted once, not once per station). Rates are
+computed per project and summarized robustly across projects: median,
+quartiles, and the ratio of sums after dropping projects outside the
+1.5 x IQR fences.
+
+Shape is the alphabetic prefix of the BOM description (W, HSS, PL, L, ...);
+the production tables carry no job type, so jobs are banded by total weight
+instead. Rows with 'ALL' are the rollups used when a specific combination
+has too few projects.
+
+Every build is a new version under local_data/labor_rates/; a build is
+skipped while the source tables are unchanged.
+
+Usage:
+    python labor_rates.py [--rebuild] [--labor-group ID] [--shape W]
+"""
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from fast_fetch import fetch_frame
+from powerfab_db import local_path, run_query
+
+RATES_DIR = 'labor_rates'
+INDEX = 'index.json'
+POUNDS_PER_TON = 2000
+MIN_PROJECTS = 3
+ALL = 'ALL'
+
+# Job size bands on productioncontroljobs.TotalWeight (tons)
+SIZE_BINS = [-np.inf, 50, 250, 1000, np.inf]
+SIZE_LABELS = ['<50 t', '50-250 t', '250-1000 t', '>1000 t']
+
+GROUPINGS = [
+    ['LaborGroupID'],
+    ['LaborGroupID', 'Shape'],
+    ['LaborGroupID', 'JobSize'],
+    ['LaborGroupID', 'Shape', 'JobSize'],
+]
+
+ACTUAL_HOURS = """
+    SELECT ProjectID, StationID,
+           SUM(RegularHours + OvertimeHours + Overtime2Hours) as Hours
+    FROM timerecords
+    WHERE InProgress = 0 OR InProgress IS NULL
+    GROUP BY ProjectID, StationID
+"""
+
+PRODUCED = """
+    SELECT pcj.ProjectID, pcis.ProductionControlID, pcis.StationID, pcj.TotalWeight,
+           m.Shape, SUM(pcis.Quantity) as Pieces, SUM(pcis.Quantity * m.UnitWeight) as Weight
+    FROM productioncontrolitemstations pcis
+    JOIN productioncontroljobs pcj ON pcj.ProductionControlID = pcis.ProductionControlID
+    LEFT JOIN (
+        SELECT ProductionControlID, MainMark,
+               UPPER(REGEXP_SUBSTR(MAX(Description), '^[A-Za-z]+')) as Shape,
+               SUM(Weight * Quantity) / NULLIF(SUM(Quantity), 0) as UnitWeight
+        FROM productioncontrolitems
+        GROUP BY ProductionControlID, MainMark
+    ) m ON m.ProductionControlID = pcis.ProductionControlID AND m.MainMark = pcis.MainMark
+    WHERE pcis.DateCompleted IS NOT NULL
+    GROUP BY pcj.ProjectID, pcis.ProductionControlID, pcis.StationID, pcj.TotalWeight, m.Shape
+"""
+
+FINGERPRINT = """
+    SELECT (SELECT MAX(TimeRecordID) FROM timerecords),
+           (SELECT MAX(ProductionControlItemStationID) FROM productioncontrolitemstations),
+           (SELECT COUNT(*) FROM productioncontrolitems),
+           (SELECT COUNT(*) FROM stationlaborgroups)
+"""
+
+
+def observations():
+    """
+    Hours, tons and pieces per (project, labor group, shape, job size).
+    """
+    actual = fetch_frame(ACTUAL_HOURS)
+    produced = fetch_frame(PRODUCED)
+    mapping = fetch_frame("SELECT StationID, LaborGroupID FROM stationlaborgroups")
+
+    actual = pd.DataFrame({
+        'ProjectID': actual['ProjectID'].astype('float64'),
+        'StationID': actual['StationID'].astype('float64'),
+        'Hours': actual['Hours'].astype('float64').fillna(0),
+    })
+    produced = pd.DataFrame({
+        'ProjectID': produced['ProjectID'].astype('float64'),
+        'StationID': produced['StationID'].astype('float64'),
+        'Shape': produced['Shape'].astype('string').fillna('?').astype('object'),
+        'JobSize': pd.cut(produced['TotalWeight'].astype('float64').fillna(0) / POUNDS_PER_TON,
+                          SIZE_BINS, labels=SIZE_LABELS).astype('object'),
+        'Pieces': produced['Pieces'].astype('float64').fillna(0),
+        'Tons': produced['Weight'].astype('float64').fillna(0) / POUNDS_PER_TON,
+    })
+
+    # Share of each (project, station)'s output; by weight, or by pieces when unweighed
+    keys = ['ProjectID', 'StationID']
+    tons = produced.groupby(keys)['Tons'].transform('sum')
+    pieces = produced.groupby(keys)['Pieces'].transform('sum')
+    produced['Share'] = np.where(tons > 0, produced['Tons'] / tons.where(tons > 0),
+                                 produced['Pieces'] / pieces.where(pieces > 0))
+
+    obs = produced.merge(actual, on=keys, how='inner')
+    obs['Hours'] = obs['Hours'] * obs['Share'].fillna(0)
+
+    mapping = pd.DataFrame({
+        'StationID': mapping['StationID'].astype('float64'),
+        'LaborGroupID': mapping['LaborGroupID'].astype('float64'),
+    }).dropna()
+    mapping['Split'] = 1.0 / mapping.groupby('StationID')['LaborGroupID'].transform('count')
+    obs = obs.merge(mapping, on='StationID', how='inner')
+    obs['Hours'] = obs['Hours'] * obs['Split']
+    # Hours add up over a labor group's stations, output does not: a piece
+    # passing two stations of one group is still one piece, so take the
+    # largest station's output as the group's
+    return (obs.groupby(['ProjectID', 'LaborGroupID', 'Shape', 'JobSize'], observed=True)
+            .agg(Hours=('Hours', 'sum'), Tons=('Tons', 'max'), Pieces=('Pieces', 'max'))
+            .reset_index())
+
+
+def robust_rate(obs, keys, base):
+    """
+    Hours per unit of `base` ('Tons' or 'Pieces') per key, across projects.
+
+    Returns:
+        DataFrame indexed by keys: Projects, Median, P25, P75, Rate
+        (ratio of sums over projects inside the IQR fences)
+    """
+    obs = obs[(obs[base] > 0) & (obs['Hours'] > 0)].copy()
+    obs['Rate'] = obs['Hours'] / obs[base]
+    grouped = obs.groupby(keys)['Rate']
+    q1 = grouped.transform('quantile', 0.25)
+    q3 = grouped.transform('quantile', 0.75)
+    fence = 1.5 * (q3 - q1)
+    kept = obs[(obs['Rate'] >= q1 - fence) & (obs['Rate'] <= q3 + fence)]
+    sums = kept.groupby(keys)[['Hours', base]].sum()
+    return pd.DataFrame({
+        'Projects': grouped.count(),
+        'Median': grouped.median(),
+        'P25': grouped.quantile(0.25),
+        'P75': grouped.quantile(0.75),
+        'Rate': sums['Hours'] / sums[base],
+    })
+
+
+def build_rates(obs=None):
+    """
+    All rate rows, one per labor group / shape / job size combination in
+    GROUPINGS, with ALL in the columns a grouping rolls up.
+    """
+    obs = observations() if obs is None else obs
+    frames = []
+    for keys in GROUPINGS:
+        per_project = obs.groupby(['ProjectID'] + keys)[['Hours', 'Tons', 'Pieces']].sum().reset_index()
+        per_ton = robust_rate(per_project, keys, 'Tons').add_prefix('HoursPerTon')
+        per_piece = robust_rate(per_project, keys, 'Pieces').add_prefix('HoursPerPiece')
+        totals = per_project.groupby(keys)[['Hours', 'Tons', 'Pieces']].sum()
+        rates = totals.join(per_ton, how='left').join(per_piece, how='left').reset_index()
+        for column in ['Shape', 'JobSize']:
+            if column not in keys:
+                rates[column] = ALL
+        frames.append(rates)
+    rates = pd.concat(frames, ignore_index=True)
+    rates = rates.rename(columns={'HoursPerTonRate': 'HoursPerTon', 'HoursPerPieceRate': 'HoursPerPiece'})
+    labels = run_query("SELECT LaborGroupID, Description as LaborGroup FROM laborgroups")
+    if labels is not None:
+        labels['LaborGroupID'] = labels['LaborGroupID'].astype('float64')
+        rates = rates.merge(labels, on='LaborGroupID', how='left')
+    else:
+        rates['LaborGroup'] = ''
+    first = ['LaborGroupID', 'LaborGroup', 'Shape', 'JobSize']
+    rates = rates[first + [c for c in rates.columns if c not in first]]
+    return rates.sort_values(['LaborGroupID', 'Shape', 'JobSize']).reset_index(drop=True)
+
+
+def rates_path(name):
+    return local_path(RATES_DIR, name)
+
+
+def load_index():
+    path = rates_path(INDEX)
+    if not os.path.exists(path):
+        return {'versions': []}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def source_fingerprint():
+    df = run_query(FINGERPRINT)
+    return [str(v) for v in df.iloc[0]] if df is not None else None
+
+
+def load_rates(rebuild=False, version=None):
+    """
+    The rate table, rebuilt as a new version only when the source tables changed.
+
+    Args:
+        rebuild: Build a new version even if nothing changed
+        version: Return this stored version instead of the latest
+
+    Returns:
+        (DataFrame, version number)
+    """
+    index = load_index()
+    versions = {v['version']: v for v in index['versions']}
+    if version is not None:
+        return feather.read_feather(rates_path(versions[version]['file'])), version
+
+    fingerprint = source_fingerprint()
+    latest = index['versions'][-1] if index['versions'] else None
+    if latest and not rebuild and latest['fingerprint'] == fingerprint:
+        return feather.read_feather(rates_path(latest['file'])), latest['version']
+
+    rates = build_rates()
+    number = (latest['version'] if latest else 0) + 1
+    name = f'rates-v{number}.feather'
+    feather.write_feather(pa.Table.from_pandas(rates, preserve_index=False), rates_path(name))
+    index['versions'].append({'version': number, 'file': name, 'fingerprint': fingerprint,
+                              'built': time.strftime('%Y-%m-%d %H:%M:%S'), 'rows': len(rates)})
+    tmp = rates_path(INDEX + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, rates_path(INDEX))
+    return rates, number
+
+
+def lookup(rates, labor_group, shape=ALL, job_size=ALL, min_projects=MIN_PROJECTS):
+    """
+    Most specific rate row with at least min_projects projects behind it,
+    falling back to the shape, job size and labor-group rollups.
+
+    Returns:
+        pandas Series (rate row), or None if the labor group has no history
+    """
+    for s, j in [(shape, job_size), (shape, ALL), (ALL, job_size), (ALL, ALL)]:
+        match = rates[(rates['LaborGroupID'] == labor_group) & (rates['Shape'] == s) & (rates['JobSize'] == j)]
+        if len(match) and match.iloc[0]['HoursPerTonProjects'] >= min_projects:
+            return match.iloc[0]
+    match = rates[(rates['LaborGroupID'] == labor_group) & (rates['Shape'] == ALL) & (rates['JobSize'] == ALL)]
+    return match.iloc[0] if len(match) else None
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rebuild', action='store_true')
+    parser.add_argument('--labor-group', type=float)
+    parser.add_argument('--shape')
+    args = parser.parse_args()
+
+    rates, version = load_rates(rebuild=args.rebuild)
+    if args.labor_group is not None:
+        rates = rates[rates['LaborGroupID'] == args.labor_group]
+    if args.shape:
+        rates = rates[rates['Shape'].isin([args.shape.upper(), ALL])]
+
+    print("=" * 90)
+    print(f"  LABOR RATES v{version} - actual hours per ton / per piece")
+    print("=" * 90)
+    print(f"  {'Labor Group':<22} {'Shape':<6} {'Job Size':<11} {'Proj':>5} {'Hrs/Ton':>9} "
+          f"{'Median':>8} {'Hrs/Pc':>8} {'Median':>8}")
+    for r in rates.itertuples(index=False):
+        print(f"  {str(r.LaborGroup)[:22]:<22} {r.Shape:<6} {r.JobSize:<11} "
+              f"{r.HoursPerTonProjects if pd.notna(r.HoursPerTonProjects) else 0:>5.0f} "
+              f"{r.HoursPerTon:>9.2f} {r.HoursPerTonMedian:>8.2f} "
+              f"{r.HoursPerPiece:>8.2f} {r.HoursPerPieceMedian:>8.2f}")
@@ -0,0 +1,484 @@
+"""
+LAZY TABLE API - READ-ONLY
+pandas-style exploration that runs as one SQL statement. Nothing is fetched
+until collect(); the chained operations are compiled into a single SELECT
+that names only the columns used and carries every filter, so wide tables
+are never pulled across with SELECT * and trimmed afterwards.
+
+    import lazy_table as pf
+
+    hours = (pf.table('timerecords')
+             .filter(pf.col('StartDate') >= '2024-01-01')
+             .join(pf.table('stations'), on='StationID')
+             .groupby('stations.Description')
+             .agg(Hours=('RegularHours', 'sum'), Records=('TimeRecordID', 'count'))
+             .sort('Hours', ascending=False)
+             .collect())
+
+Columns of the first table are referenced by name; columns of joined tables
+as 'table.Column'. Operations that cannot be folded into the current
+statement (filtering an aggregate, grouping a limited result) wrap it as a
+derived table, which MySQL merges back where it can.
+
+Output column names are unique. A join without select() lists its columns
+explicitly (from INFORMATION_SCHEMA), and a name that repeats on the joined
+side comes out as 'table.Column' - as does select('JobNumber',
+'projects.JobNumber'). Other clashing names are rejected.
+"""
+from fast_fetch import fetch_frame
+from powerfab_db import table_columns as server_columns
+
+_table_columns = {}
+
+AGGREGATES = {
+    'sum': 'SUM({})',
+    'mean': 'AVG({})',
+    'min': 'MIN({})',
+    'max': 'MAX({})',
+    'count': 'COUNT({})',
+    'nunique': 'COUNT(DISTINCT {})',
+    'std': 'STDDEV_SAMP({})',
+    'var': 'VAR_SAMP({})',
+}
+
+
+def table_columns(table):
+    """Column names of a server table (cached per process)."""
+    if table not in _table_columns:
+        _table_columns[table] = server_columns(table)
+    return _table_columns[table]
+
+
+class Expr:
+    """Column expression; comparisons and arithmetic build SQL, not values."""
+
+    def render(self, resolve):
+        """Returns (sql, params), column names mapped through resolve()."""
+        raise NotImplementedError
+
+    def _op(self, op, other):
+        return Op(op, self, other if isinstance(other, Expr) else Lit(other))
+
+    def __eq__(self, other):
+        return Postfix(self, 'IS NULL') if other is None else self._op('=', other)
+
+    def __ne__(self, other):
+        return Postfix(self, 'IS NOT NULL') if other is None else self._op('<>', other)
+
+    def __lt__(self, other):
+        return self._op('<', other)
+
+    def __le__(self, other):
+        return self._op('<=', other)
+
+    def __gt__(self, other):
+        return self._op('>', other)
+
+    def __ge__(self, other):
+        return self._op('>=', other)
+
+    def __add__(self, other):
+        return self._op('+', other)
+
+    def __sub__(self, other):
+        return self._op('-', other)
+
+    def __mul__(self, other):
+        return self._op('*', other)
+
+    def __truediv__(self, other):
+        return self._op('/', other)
+
+    def __and__(self, other):
+        return self._op('AND', other)
+
+    def __or__(self, other):
+        return self._op('OR', other)
+
+    def __invert__(self):
+        return Func('NOT ({})', self)
+
+    __hash__ = object.__hash__
+
+    def isin(self, values):
+        return InList(self, list(values))
+
+    def between(self, low, high):
+        return (self >= low) & (self <= high)
+
+    def like(self, pattern):
+        return self._op('LIKE', pattern)
+
+    def isnull(self):
+        return Postfix(self, 'IS NULL')
+
+    def notnull(self):
+        return Postfix(self, 'IS NOT NULL')
+
+    def alias(self, name):
+        return Named(self, name)
+
+
+class Col(Expr):
+
+    def __init__(self, name):
+        self.name = name
+
+    def render(self, resolve):
+        return resolve(self.name), []
+
+
+class Lit(Expr):
+
+    def __init__(self, value):
+        self.value = value
+
+    def render(self, resolve):
+        return '%s', [self.value]
+
+
+class Op(Expr):
+
+    def __init__(self, op, left, right):
+        self.op, self.left, self.right = op, left, right
+
+    def render(self, resolve):
+        left, left_params = self.left.render(resolve)
+        right, right_params = self.right.render(resolve)
+        return f"({left} {self.op} {right})", left_params + right_params
+
+
+class Postfix(Expr):
+
+    def __init__(self, expr, suffix):
+        self.expr, self.suffix = expr, suffix
+
+    def render(self, resolve):
+        sql, params = self.expr.render(resolve)
+        return f"({sql} {self.suffix})", params
+
+
+class InList(Expr):
+
+    def __init__(self, expr, values):
+        self.expr, self.values = expr, values
+
+    def render(self, resolve):
+        sql, params = self.expr.render(resolve)
+        if not self.values:
+            return "FALSE", []
+        return f"{sql} IN ({', '.join(['%s'] * len(self.values))})", params + self.values
+
+
+class Func(Expr):
+    """SQL template with one '{}' for the argument, e.g. 'SUM({})'."""
+
+    def __init__(self, template, expr):
+        self.template, self.expr = template, expr
+
+    def render(self, resolve):
+        if isinstance(self.expr, Col) and self.expr.name == '*':
+            return self.template.format('*'), []
+        sql, params = self.expr.render(resolve)
+        return self.template.format(sql), params
+
+
+class Named(Expr):
+
+    def __init__(self, expr, name):
+        self.expr, self.name = expr, name
+
+    def render(self, resolve):
+        return self.expr.render(resolve)
+
+
+def col(name):
+    """Column reference: 'Column' or 'table.Column'."""
+    return Col(name)
+
+
+def lit(value):
+    return Lit(value)
+
+
+def as_expr(value):
+    return value if isinstance(value, Expr) else Col(value)
+
+
+def output_name(expr):
+    if isinstance(expr, Named):
+        return expr.name
+    if isinstance(expr, Col):
+        return expr.name.split('.')[-1]
+    raise ValueError("Computed columns need a name: use .alias('Name') or select(Name=expr)")
+
+
+def output_names(exprs):
+    """
+    Output names for a projection. A qualified column whose short name is
+    already taken keeps its qualifier ('projects.JobNumber'); any other
+    clash is an error rather than a silently overwritten column.
+    """
+    names = []
+    for expr in exprs:
+        name = output_name(expr)
+        if name in names and isinstance(expr, Col) and '.' in expr.name:
+            name = expr.name
+        if name in names:
+            raise ValueError(f"Duplicate output column {name!r}: use .alias() or select(Name=expr)")
+        names.append(name)
+    return names
+
+
+def aggregate(column, func):
+    """pf.aggregate('Hours', 'sum') == SUM(Hours); column '*' for COUNT(*)."""
+    if func not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate {func!r}. Known: {sorted(AGGREGATES)}")
+    return Func(AGGREGATES[func], as_expr(column))
+
+
+class LazyTable:
+    """
+    A query plan over one table (plus joins). Every method returns a new
+    plan; collect() runs it.
+    """
+
+    def __init__(self, source, name=None):
+        self.source = source       # table name, or a LazyTable compiled as a derived table
+        self.name = name or (source if isinstance(source, str) else source.name)
+        self.aliases = {self.name: 't0'}
+        self.joins = []            # (how, source, alias, [(left expr, right column)])
+        self.where = []
+        self.projection = None     # [(expr, name)]
+        self.keys = None           # [(expr, name)] once grouped
+        self.aggregates = None     # [(expr, name)]
+        self.order = []            # [(expr, ascending)]
+        self.limit_rows = None
+
+    def _copy(self):
+        plan = LazyTable.__new__(LazyTable)
+        plan.__dict__.update(self.__dict__)
+        plan.aliases = dict(self.aliases)
+        plan.joins = list(self.joins)
+        plan.where = list(self.where)
+        plan.order = list(self.order)
+        return plan
+
+    def _shaped(self):
+        return self.projection is not None or self.keys is not None or self.limit_rows is not None
+
+    def _wrap(self):
+        """This plan as the derived table of a new one."""
+        return LazyTable(self)
+
+    def _plain(self):
+        return (isinstance(self.source, str) and not self.joins and not self.where
+                and not self._shaped() and not self.order)
+
+    # --- building ------------------------------------------------------------
+
+    def select(self, *columns, **named):
+        """Keep only these columns/expressions (named ones become aliases)."""
+        plan = self._wrap() if self._shaped() else self._copy()
+        items = [as_expr(c) for c in columns] + [Named(as_expr(e), n) for n, e in named.items()]
+        plan.projection = list(zip(items, output_names(items)))
+        return plan
+
+    def filter(self, *conditions, **equals):
+        """
+        Keep rows matching all conditions: Expr predicates, or Column=value
+        keywords (a list/tuple value means IN).
+        """
+        # Conditions refer to the output names of a projection, so wrap it too
+        plan = self._wrap() if self._shaped() else self._copy()
+        for condition in conditions:
+            plan.where.append(condition)
+        for name, value in equals.items():
+            column = Col(name)
+            plan.where.append(column.isin(value) if isinstance(value, (list, tuple, set)) else column == value)
+        return plan
+
+    def join(self, other, on=None, left_on=None, right_on=None, how='inner'):
+        """
+        Join another table (or plan).
+
+        Args:
+            other: LazyTable (usually pf.table(name))
+            on: Column name(s) present in both
+            left_on / right_on: Column name(s) when they differ; left names
+                may be qualified ('stations.StationID')
+            how: 'inner' or 'left'
+        """
+        if how not in ('inner', 'left'):
+            raise ValueError("how must be 'inner' or 'left'")
+        plan = self._wrap() if self._shaped() else self._copy()
+        left = [on] if isinstance(on, str) else list(on or left_on or [])
+        right = [on] if isinstance(on, str) else list(on or right_on or [])
+        if isinstance(left_on, str):
+            left = [left_on]
+        if isinstance(right_on, str):
+            right = [right_on]
+        if not left or len(left) != len(right):
+            raise ValueError("join needs on= or matching left_on=/right_on=")
+        alias = f"t{len(plan.joins) + 1}"
+        source = other.source if other._plain() else other
+        plan.joins.append((how, source, alias, list(zip(left, right))))
+        plan.aliases[other.name] = alias
+        return plan
+
+    def groupby(self, *keys):
+        return GroupBy(self, keys)
+
+    def sort(self, *columns, ascending=True):
+        plan = self._wrap() if self.limit_rows is not None else self._copy()
+        plan.order = [(as_expr(c), ascending) for c in columns]
+        return plan
+
+    def head(self, n):
+        plan = self._wrap() if self.limit_rows is not None else self._copy()
+        plan.limit_rows = int(n)
+        return plan
+
+    limit = head
+
+    # --- compiling -----------------------------------------------------------
+
+    def columns(self):
+        """Output column names, in order."""
+        if self.keys is not None:
+            return [n for _, n in self.keys + self.aggregates]
+        if self.projection is not None:
+            return [n for _, n in self.projection]
+        return [name for name, _ in self.star_columns()]
+
+    def star_columns(self):
+        """
+        (output name, column sql) for every column of t0 and the joins;
+        a name already taken is renamed 'table.Column'.
+        """
+        names = {alias: table for table, alias in self.aliases.items()}
+        sources = [(self.source, 't0')] + [(source, alias) for _, source, alias, _ in self.joins]
+        items = []
+        seen = set()
+        for source, alias in sources:
+            for column in (table_columns(source) if isinstance(source, str) else source.columns()):
+                name = column if column not in seen else f"{names[alias]}.{column}"
+                seen.add(name)
+                items.append((name, f"{alias}.`{column}`"))
+        return items
+
+    def resolve(self, name):
+        if name == '*':
+            return '*'
+        table, _, column = name.rpartition('.')
+        if table and table not in self.aliases and not isinstance(self.source, str):
+            # After wrapping, joined columns are plain columns of the derived
+            # table - under 'table.Column' if the name was taken by t0
+            if name in self.source.columns():
+                column = name
+            table = ''
+        if table and table not in self.aliases:
+            raise KeyError(f"{table} is not part of this query (joined: {sorted(self.aliases)})")
+        return f"{self.aliases[table] if table else 't0'}.`{column}`"
+
+    def to_sql(self):
+        """
+        Returns:
+            (sql, params) for the whole plan
+        """
+        params = []
+
+        def render(expr):
+            sql, expr_params = expr.render(self.resolve)
+            params.extend(expr_params)
+            return sql
+
+        def source_sql(source, alias):
+            if isinstance(source, str):
+                return f"`{source}` {alias}"
+            sql, source_params = source.to_sql()
+            params.extend(source_params)
+            return f"(\n{sql}\n) {alias}"
+
+        if self.keys is not None:
+            items = [f"{render(e)} as `{n}`" for e, n in self.keys + self.aggregates]
+        elif self.projection is not None:
+            items = [f"{render(e)} as `{n}`" for e, n in self.projection]
+        elif self.joins:
+            # t0.*, t1.* would repeat shared names (StationID, ProjectID, ...),
+            # which a derived table rejects and a fetched frame overwrites
+            items = [f"{sql} as `{name}`" for name, sql in self.star_columns()]
+        else:
+            items = ['t0.*'] + [f"{alias}.*" for _, _, alias, _ in self.joins]
+        sql = f"SELECT {', '.join(items)}\nFROM {source_sql(self.source, 't0')}"
+        for how, source, alias, pairs in self.joins:
+            joined = source_sql(source, alias)
+            condition = " AND ".join(f"{render(as_expr(l))} = {alias}.`{r}`" for l, r in pairs)
+            sql += f"\n{'LEFT JOIN' if how == 'left' else 'JOIN'} {joined} ON {condition}"
+        if self.where:
+            sql += "\nWHERE " + " AND ".join(render(c) for c in self.where)
+        if self.keys:
+            sql += "\nGROUP BY " + ", ".join(render(e) for e, _ in self.keys)
+        if self.order:
+            # Output names first, so sorting by an aggregate's name works
+            names = {n for _, n in (self.keys or []) + (self.aggregates or []) + (self.projection or [])}
+            sql += "\nORDER BY " + ", ".join(
+                (f"`{e.name}`" if isinstance(e, Col) and e.name in names else render(e))
+                + ("" if ascending else " DESC") for e, ascending in self.order)
+        if self.limit_rows is not None:
+            sql += f"\nLIMIT {self.limit_rows}"
+        return sql, params
+
+    def collect(self, pool_name='powerfab'):
+        """Run the plan; returns a pandas DataFrame."""
+        sql, params = self.to_sql()
+        return fetch_frame(sql, tuple(params) or None, pool_name=pool_name)
+
+    def __repr__(self):
+        sql, params = self.to_sql()
+        return f"<LazyTable\n{sql}\n-- params: {params}>"
+
+
+class GroupBy:
+
+    def __init__(self, plan, keys):
+        self.plan = plan
+        self.keys = [as_expr(k) for k in keys]
+
+    def agg(self, **named):
+        """
+        Aggregate per group, pandas named-aggregation style:
+        .agg(Hours=('RegularHours', 'sum'), Rows=('*', 'count'), Total=pf.aggregate(expr, 'sum'))
+        """
+        source = self.plan
+        plan = source._wrap() if source._shaped() else source._copy()
+        aggregates = [spec if isinstance(spec, Expr) else aggregate(*spec) for spec in named.values()]
+        names = output_names(self.keys + [Named(e, n) for e, n in zip(aggregates, named)])
+        plan.keys = list(zip(self.keys, names))
+        plan.aggregates = list(zip(aggregates, names[len(self.keys):]))
+        return plan
+
+    def size(self):
+        return self.agg(Count=('*', 'count'))
+
+
+def table(name):
+    """Start a lazy query on a table."""
+    return LazyTable(name)
+
+
+if __name__ == '__main__':
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    plan = (table('timerecords')
+            .filter(col('StartDate') >= '2024-01-01')
+            .join(table('stations'), on='StationID')
+            .groupby('stations.Description')
+            .agg(Hours=(col('RegularHours') + col('OvertimeHours') + col('Overtime2Hours'), 'sum'),
+                 Records=('*', 'count'))
+            .sort('Hours', ascending=False)
+            .head(15))
+    print(plan)
+    if '--run' in sys.argv:
+        print(plan.collect().to_string(index=False))
@@ -0,0 +1,260 @@
+"""
+TOP-K LEADERBOARDS - READ-ONLY
+Top stations, projects, jobs and employees by hours, output and efficiency,
+over all history or any trailing window (7/30/90 days, ...), without a
+GROUP BY / ORDER BY over history per question.
+
+Time records and completions are streamed once, in key order, into small
+per-key day buckets (bounded by RETENTION_DAYS) plus all-time totals. Later
+refreshes only stream rows above the stored watermarks; time records are
+consumed only up to the oldest record still in progress, since those can
+still change.
+
+Metrics:
+    hours           Regular + OT + OT2 from timerecords
+    overtime        OT + OT2
+    records         time entries
+    pieces          completed quantity (productioncontrolitemstations)
+    piece_hours     timer hours on completions
+    pieces_per_hour pieces / piece_hours      (ratio)
+    overtime_share  overtime / hours          (ratio)
+
+Usage:
+    python leaderboards.py [--dimension station] [--metric hours] [--days 30] [--k 15]
+"""
+import heapq
+from datetime import date
+
+from powerfab_db import get_connection, restore_state, store_state
+
+STATE_FILE = 'leaderboards.pkl'
+RETENTION_DAYS = 400
+BATCH_SIZE = 10_000
+
+BASE_METRICS = ['hours', 'overtime', 'records', 'pieces', 'piece_hours']
+RATIOS = {
+    'pieces_per_hour': ('pieces', 'piece_hours'),
+    'overtime_share': ('overtime', 'hours'),
+}
+
+# dimension -> (time record column, completion column); None = not available
+DIMENSIONS = {
+    'station': ('StationID', 'StationID'),
+    'employee': ('EmployeeUserID', 'UserID'),
+    'project': ('ProjectID', None),
+    'job': (None, 'ProductionControlID'),
+}
+
+LABEL_QUERIES = {
+    'station': "SELECT StationID, Description FROM stations",
+    'employee': "SELECT UserID, CONCAT(COALESCE(FirstName, ''), ' ', COALESCE(LastName, '')) FROM users",
+    'project': "SELECT ProjectID, CONCAT(JobNumber, ' ', COALESCE(JobDescription, '')) FROM projects",
+    'job': "SELECT pcj.ProductionControlID, CONCAT(pcj.JobNumber, ' ', COALESCE(p.JobDescription, '')) "
+           "FROM productioncontroljobs pcj LEFT JOIN projects p ON p.ProjectID = pcj.ProjectID",
+}
+
+
+def day_number(value):
+    return value.toordinal() if value is not None else None
+
+
+class Leaderboards:
+    """Streaming per-key aggregates with day buckets for windowed top-K."""
+
+    def __init__(self):
+        self.totals = {dim: {} for dim in DIMENSIONS}    # dim -> key -> [metric values]
+        self.buckets = {dim: {} for dim in DIMENSIONS}   # dim -> key -> {day: [metric values]}
+        self.time_watermark = 0
+        self.completion_watermark = 0
+        self.latest_day = 0
+
+    @classmethod
+    def load(cls):
+        boards = cls()
+        restore_state(boards, STATE_FILE)
+        return boards
+
+    def save(self):
+        store_state(self, STATE_FILE)
+
+    # --- streaming ---------------------------------------------------------
+
+    def add(self, dim, key, day, values):
+        """Add metric values (list aligned with BASE_METRICS) for one key."""
+        if key is None:
+            return
+        total = self.totals[dim].setdefault(key, [0.0] * len(BASE_METRICS))
+        for i, v in enumerate(values):
+            total[i] += v
+        if day is None:
+            return
+        bucket = self.buckets[dim].setdefault(key, {}).setdefault(day, [0.0] * len(BASE_METRICS))
+        for i, v in enumerate(values):
+            bucket[i] += v
+        self.latest_day = max(self.latest_day, day)
+
+    def add_time_record(self, row):
+        _, project, employee, station, start, regular, ot, ot2 = row
+        regular, ot, ot2 = float(regular or 0), float(ot or 0), float(ot2 or 0)
+        values = [regular + ot + ot2, ot + ot2, 1.0, 0.0, 0.0]
+        keys = {'StationID': station, 'EmployeeUserID': employee, 'ProjectID': project}
+        day = day_number(start)
+        for dim, (column, _) in DIMENSIONS.items():
+            if column:
+                self.add(dim, keys[column], day, values)
+
+    def add_completion(self, row):
+        _, job, user, station, completed, quantity, hours = row
+        values = [0.0, 0.0, 0.0, float(quantity or 0), float(hours or 0)]
+        keys = {'StationID': station, 'UserID': user, 'ProductionControlID': job}
+        day = day_number(completed)
+        for dim, (_, column) in DIMENSIONS.items():
+            if column:
+                self.add(dim, keys[column], day, values)
+
+    def prune(self):
+        """Drop day buckets older than the retention window (keeps memory bounded)."""
+        cutoff = self.latest_day - RETENTION_DAYS
+        for by_key in self.buckets.values():
+            for days in by_key.values():
+                for day in [d for d in days if d < cutoff]:
+                    del days[day]
+
+    def _stream(self, cursor, sql, params, handler):
+        cursor.execute(sql, params)
+        last = None
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                handler(row)
+            last = rows[-1][0]
+        return last
+
+    def refresh(self):
+        """
+        Stream rows added since the last refresh.
+        """
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT MIN(CASE WHEN InProgress = 1 THEN TimeRecordID END), MAX(TimeRecordID)
+                FROM timerecords
+                WHERE TimeRecordID > %s
+            """, (self.time_watermark,))
+            first_open, max_id = cursor.fetchone()
+            if max_id is not None:
+                limit = first_open - 1 if first_open is not None else max_id
+                self._stream(cursor, """
+                    SELECT TimeRecordID, ProjectID, EmployeeUserID, StationID, StartDate,
+                           RegularHours, OvertimeHours, Overtime2Hours
+                    FROM timerecords
+                    WHERE TimeRecordID > %s AND TimeRecordID <= %s
+                    ORDER BY TimeRecordID
+                """, (self.time_watermark, limit), self.add_time_record)
+                self.time_watermark = max(self.time_watermark, limit)
+
+            last = self._stream(cursor, """
+                SELECT ProductionControlItemStationID, ProductionControlID, UserID, StationID,
+                       DateCompleted, Quantity, Hours
+                FROM productioncontrolitemstations
+                WHERE ProductionControlItemStationID > %s AND DateCompleted IS NOT NULL
+                ORDER BY ProductionControlItemStationID
+            """, (self.completion_watermark,), self.add_completion)
+            if last is not None:
+                self.completion_watermark = last
+            cursor.close()
+        finally:
+            conn.close()
+        self.prune()
+        self.save()
+
+    # --- queries -----------------------------------------------------------
+
+    def values(self, dim, key, days=None, as_of=None):
+        """Metric values for one key, all-time or over the trailing `days` days."""
+        if days is None:
+            return self.totals[dim].get(key, [0.0] * len(BASE_METRICS))
+        end = as_of.toordinal() if as_of else self.latest_day
+        start = end - days + 1
+        out = [0.0] * len(BASE_METRICS)
+        for day, bucket in self.buckets[dim].get(key, {}).items():
+            if start <= day <= end:
+                for i, v in enumerate(bucket):
+                    out[i] += v
+        return out
+
+    def metric(self, values, metric):
+        if metric in RATIOS:
+            num, den = (values[BASE_METRICS.index(m)] for m in RATIOS[metric])
+            return num / den if den else None
+        return values[BASE_METRICS.index(metric)]
+
+    def top(self, dim, metric='hours', k=15, days=None, as_of=None, ascending=False):
+        """
+        Top-K keys for a dimension and metric.
+
+        Args:
+            dim: 'station', 'employee', 'project' or 'job'
+            metric: Name from BASE_METRICS or RATIOS
+            k: Number of entries
+            days: Trailing window in days (None = all history,
+                at most RETENTION_DAYS)
+            as_of: Window end date, defaults to the latest day seen
+            ascending: Bottom-K instead of top-K
+
+        Returns:
+            list of (key, metric value, all metric values dict)
+        """
+        if days is not None and days > RETENTION_DAYS:
+            raise ValueError(f"Windows longer than {RETENTION_DAYS} days are not retained")
+        scored = []
+        for key in self.totals[dim]:
+            values = self.values(dim, key, days, as_of)
+            score = self.metric(values, metric)
+            if score:
+                scored.append((score, key, values))
+        pick = heapq.nsmallest if ascending else heapq.nlargest
+        best = pick(k, scored, key=lambda item: item[0])
+        return [(key, score, dict(zip(BASE_METRICS, values))) for score, key, values in best]
+
+
+def labels(dim):
+    """Display names for a dimension's keys."""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(LABEL_QUERIES[dim])
+        names = {key: str(name or '').strip() for key, name in cursor.fetchall()}
+        cursor.close()
+    finally:
+        conn.close()
+    return names
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dimension', default='station', choices=sorted(DIMENSIONS))
+    parser.add_argument('--metric', default='hours', choices=BASE_METRICS + sorted(RATIOS))
+    parser.add_argument('--days', type=int, help='trailing window (default: all history)')
+    parser.add_argument('--k', type=int, default=15)
+    args = parser.parse_args()
+
+    boards = Leaderboards.load()
+    boards.refresh()
+    names = labels(args.dimension)
+    window = f"last {args.days} days" if args.days else "all history"
+    as_of = date.fromordinal(boards.latest_day) if boards.latest_day else None
+
+    print("=" * 70)
+    print(f"TOP {args.k} {args.dimension.upper()} BY {args.metric.upper()} ({window}, as of {as_of})")
+    print("=" * 70)
+    print(f"  {'Key':>8} {'Name':<35} {args.metric:>15}")
+    for key, score, _ in boards.top(args.dimension, args.metric, args.k, args.days):
+        print(f"  {str(key):>8} {names.get(key, '')[:35]:<35} {score:>15.2f}")
@@ -0,0 +1,308 @@
+"""
+LIVE FLOOR MONITOR - READ-ONLY
+"Who is clocked in right now, and where?" without scanning timerecords.
+
+One full SELECT of InProgress = 1 records seeds an in-memory index keyed by
+employee and station. After that each tick only looks at:
+  - rows newer than the highest TimeRecordID seen (new clock-ins), and
+  - the records currently open (to notice clock-outs),
+both primary-key lookups. Snapshots are pushed to subscriber callbacks and
+can be served as JSON for the shop-floor display.
+
+If the connection drops, the snapshot is marked stale (with the error) and
+the monitor reconnects with backoff; the first tick after reconnecting
+catches up on everything missed.
+
+Usage:
+    python live_floor.py [--interval 0.5] [--port 8765]
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mysql.connector
+
+from powerfab_db import get_pool
+
+LIVE_POOL = 'live'
+MAX_BACKOFF = 30
+
+RECORD_COLUMNS = """
+    tr.TimeRecordID, tr.EmployeeUserID, tr.StationID, tr.ProjectID,
+    tr.StartUnixTime, tr.InProgress
+"""
+
+
+class LiveFloorMonitor:
+    """
+    In-memory index of in-progress time records, refreshed incrementally.
+
+    Args:
+        poll_interval: Seconds between ticks
+        pool_name: Connection pool to use (one connection is held while running)
+    """
+
+    def __init__(self, poll_interval=0.5, pool_name=LIVE_POOL):
+        self.poll_interval = poll_interval
+        self.pool_name = pool_name
+        self.open_records = {}      # TimeRecordID -> record dict
+        self.by_employee = {}       # EmployeeUserID -> set of TimeRecordIDs
+        self.by_station = {}        # StationID -> set of TimeRecordIDs
+        self.max_record_id = 0
+        self.employees = {}
+        self.stations = {}
+        self.projects = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+        self.seeded = False
+        self.error = None           # last database error while stale, else None
+
+    # --- index maintenance -------------------------------------------------
+
+    def _add(self, record):
+        record_id = record['TimeRecordID']
+        self.open_records[record_id] = record
+        self.by_employee.setdefault(record['EmployeeUserID'], set()).add(record_id)
+        self.by_station.setdefault(record['StationID'], set()).add(record_id)
+
+    def _remove(self, record_id):
+        record = self.open_records.pop(record_id, None)
+        if record is None:
+            return
+        for index, key in ((self.by_employee, record['EmployeeUserID']),
+                           (self.by_station, record['StationID'])):
+            ids = index.get(key)
+            if ids:
+                ids.discard(record_id)
+                if not ids:
+                    del index[key]
+
+    def _fetch(self, sql, params=()):
+        cursor = self._conn.cursor(dictionary=True)
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    def _load_lookups(self):
+        self.stations = {r['StationID']: r['Description'] for r in
+                         self._fetch("SELECT StationID, Description FROM stations")}
+        self.employees = {r['UserID']: f"{r['FirstName'] or ''} {r['LastName'] or ''}".strip()
+                          for r in self._fetch("SELECT UserID, FirstName, LastName FROM users")}
+        self.projects = {r['ProjectID']: r['JobNumber'] for r in
+                         self._fetch("SELECT ProjectID, JobNumber FROM projects")}
+
+    def seed(self):
+        """Full load of open records - only done once at start."""
+        self._load_lookups()
+        with self._lock:
+            for record in self._fetch(f"SELECT {RECORD_COLUMNS} FROM timerecords tr WHERE tr.InProgress = 1"):
+                self._add(record)
+            row = self._fetch("SELECT MAX(TimeRecordID) as MaxID FROM timerecords")[0]
+            self.max_record_id = row['MaxID'] or 0
+        self.seeded = True
+
+    def tick(self):
+        """
+        Apply changes since the last tick.
+
+        Returns:
+            True if the set of open records changed
+        """
+        open_ids = list(self.open_records)
+        where = "tr.TimeRecordID > %s"
+        params = [self.max_record_id]
+        if open_ids:
+            where += f" OR tr.TimeRecordID IN ({', '.join(['%s'] * len(open_ids))})"
+            params += open_ids
+        rows = self._fetch(f"SELECT {RECORD_COLUMNS} FROM timerecords tr WHERE {where}", params)
+
+        changed = False
+        with self._lock:
+            for record in rows:
+                record_id = record['TimeRecordID']
+                self.max_record_id = max(self.max_record_id, record_id)
+                if record['InProgress']:
+                    if record_id not in self.open_records:
+                        changed = True
+                    self._add(record)
+                elif record_id in self.open_records:
+                    self._remove(record_id)
+                    changed = True
+        if any(r['StationID'] not in self.stations or r['EmployeeUserID'] not in self.employees
+               for r in rows if r['InProgress']):
+            self._load_lookups()
+        return changed
+
+    # --- read side ---------------------------------------------------------
+
+    def snapshot(self):
+        """
+        Current floor state.
+
+        Returns:
+            dict with 'as_of', 'clocked_in' (one entry per open record, sorted
+            by station then employee), 'by_station' head counts, and 'stale'
+            / 'error' (True and the message while the database is unreachable)
+        """
+        now = time.time()
+        with self._lock:
+            records = list(self.open_records.values())
+        clocked_in = []
+        for r in records:
+            started = r['StartUnixTime']
+            clocked_in.append({
+                'TimeRecordID': r['TimeRecordID'],
+                'EmployeeUserID': r['EmployeeUserID'],
+                'Employee': self.employees.get(r['EmployeeUserID'], ''),
+                'StationID': r['StationID'],
+                'Station': self.stations.get(r['StationID'], ''),
+                'JobNumber': self.projects.get(r['ProjectID'], ''),
+                'Hours': round((now - started) / 3600, 2) if started else None,
+            })
+        clocked_in.sort(key=lambda r: (r['Station'] or '', r['Employee'] or ''))
+        counts = {}
+        for r in clocked_in:
+            counts[r['Station']] = counts.get(r['Station'], 0) + 1
+        return {
+            'as_of': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
+            'clocked_in': clocked_in,
+            'by_station': counts,
+            'stale': self.error is not None,
+            'error': self.error,
+        }
+
+    def at_station(self, station_id):
+        with self._lock:
+            return [self.open_records[i] for i in self.by_station.get(station_id, ())]
+
+    def for_employee(self, employee_id):
+        with self._lock:
+            return [self.open_records[i] for i in self.by_employee.get(employee_id, ())]
+
+    def subscribe(self, callback):
+        """Call callback(snapshot) whenever the floor changes (and once on start)."""
+        self._subscribers.append(callback)
+
+    def _publish(self):
+        snap = self.snapshot()
+        for callback in list(self._subscribers):
+            try:
+                callback(snap)
+            except Exception as err:
+                print(f"Subscriber error: {err}")
+
+    # --- lifecycle ---------------------------------------------------------
+
+    def _connect(self):
+        self._conn = get_pool(self.pool_name, size=1).get_connection()
+        # Autocommit so every tick sees rows committed since the last one
+        self._conn.autocommit = True
+
+    def _reconnect(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except mysql.connector.Error:
+                pass
+            self._conn = None
+        self._connect()
+
+    def _run(self):
+        delay = 0
+        while not self._stop.wait(delay):
+            try:
+                if self._conn is None:
+                    self._reconnect()
+                if not self.seeded:
+                    self.seed()
+                    changed = True
+                else:
+                    changed = self.tick()
+            except mysql.connector.Error as err:
+                # Keep serving the last state, flagged stale, and retry
+                first = self.error is None
+                self.error = str(err)
+                delay = min(MAX_BACKOFF, max(1, 2 * delay))
+                print(f"Live floor: {err} - reconnecting in {delay:g}s")
+                if first:
+                    self._publish()
+                try:
+                    self._reconnect()
+                except mysql.connector.Error:
+                    self._conn = None
+                continue
+            if self.error is not None:
+                print("Live floor: reconnected")
+                self.error = None
+                changed = True
+            delay = self.poll_interval
+            if changed:
+                self._publish()
+
+    def start(self):
+        self._connect()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='live-floor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def serve(self, port=8765, host='127.0.0.1'):
+        """
+        Serve GET /snapshot as JSON for the floor display (blocks).
+        """
+        monitor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/snapshot':
+                    self.send_error(404)
+                    return
+                body = json.dumps(monitor.snapshot(), default=str).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        ThreadingHTTPServer((host, port), Handler).serve_forever()
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--interval', type=float, default=0.5)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    def show(snap):
+        stale = f" (STALE: {snap['error']})" if snap['stale'] else ""
+        print(f"\n--- {snap['as_of']}: {len(snap['clocked_in'])} clocked in{stale} ---")
+        for r in snap['clocked_in']:
+            print(f"  {r['Station'][:20]:>20} {r['Employee'][:25]:>25} {str(r['JobNumber']):>10} {r['Hours'] or '':>6}")
+
+    monitor = LiveFloorMonitor(poll_interval=args.interval)
+    monitor.subscribe(show)
+    monitor.start()
+    print(f"  Serving http://127.0.0.1:{args.port}/snapshot (Ctrl-C to stop)")
+    try:
+        monitor.serve(args.port)
+    except KeyboardInterrupt:
+        monitor.stop()
@@ -0,0 +1,137 @@
+"""
+MULTI-DATABASE FAN-OUT - READ-ONLY
+Runs the same analysis against several PowerFab databases at once (one per
+division) and stacks the results with a Source column.
+
+Sources come from POWERFAB_SOURCES, a comma-separated list of
+name=[host[:port]/]database entries; anything not given is taken from
+DB_CONFIG (user and password are shared):
+
+    POWERFAB_SOURCES="east=fabrication,west=shop2:3307/all-things-metal"
+
+Each source gets its own connection pool and the sources run concurrently,
+so a company-wide report takes as long as the slowest division.
+
+The variance analysis compares each job's production control budget
+(productioncontroljobs.TotalManHours - the same figure Patterns 1 and 6
+use) with the hours clocked against it. It sums the whole of timerecords,
+which no date pushdown may shorten, so it runs with its own guardrail
+budget, VARIANCE_ROW_BUDGET (POWERFAB_VARIANCE_ROW_BUDGET).
+
+Usage:
+    python multi_source.py [variance|station_hours|throughput ...]
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from join_resolver import query
+from powerfab_db import DB_CONFIG, get_pool
+
+# Rows examined allowed for the variance analysis, which has to read every
+# time record (sql_guard.ROW_BUDGET would reject it on a large database)
+VARIANCE_ROW_BUDGET = int(os.getenv('POWERFAB_VARIANCE_ROW_BUDGET', 50_000_000))
+
+
+def parse_source(spec):
+    """'name=[host[:port]/]database' -> (name, connection settings)"""
+    name, _, target = spec.strip().partition('=')
+    config = dict(DB_CONFIG)
+    if '/' in target:
+        server, target = target.split('/', 1)
+        host, _, port = server.partition(':')
+        config['host'] = host
+        if port:
+            config['port'] = int(port)
+    config['database'] = target or config['database']
+    return name.strip(), config
+
+
+def load_sources(spec=None):
+    """
+    Returns:
+        dict of source name -> connection settings (just the default
+        database when POWERFAB_SOURCES is not set)
+    """
+    spec = spec if spec is not None else os.getenv('POWERFAB_SOURCES', '')
+    sources = dict(parse_source(s) for s in spec.split(',') if s.strip())
+    return sources or {DB_CONFIG['database']: dict(DB_CONFIG)}
+
+
+def pool_name(source):
+    return f"source_{source}"
+
+
+def variance(pool):
+    """Budgeted vs actual hours per job, Variance = actual - budget."""
+    df = query(['budget_hours', 'actual_hours'], ['projects.JobNumber'],
+               pool_name=pool, budget=VARIANCE_ROW_BUDGET)
+    if df is None:
+        return None
+    df['Variance'] = df['actual_hours'].fillna(0) - df['budget_hours'].fillna(0)
+    return df
+
+
+# analysis name -> function(pool name) returning a DataFrame (or None on error)
+ANALYSES = {
+    'variance': variance,
+    'station_hours': lambda pool: query(['actual_hours', 'time_entries'], ['stations.Description'],
+                                        pool_name=pool),
+    'throughput': lambda pool: query(['pieces_completed', 'tracked_hours'], ['stations.Description'],
+                                     pool_name=pool),
+}
+
+
+def fan_out(analysis, sources=None, workers=None):
+    """
+    Run one analysis on every source concurrently.
+
+    Args:
+        analysis: Name from ANALYSES, or a function taking a pool name
+        sources: dict from load_sources(), defaults to POWERFAB_SOURCES
+        workers: Concurrent sources, defaults to one per source
+
+    Returns:
+        (DataFrame with a leading Source column, list of failed source names)
+    """
+    run = ANALYSES[analysis] if isinstance(analysis, str) else analysis
+    sources = sources or load_sources()
+    for name, config in sources.items():
+        get_pool(pool_name(name), config=config)
+
+    with ThreadPoolExecutor(max_workers=workers or len(sources)) as pool:
+        futures = {name: pool.submit(run, pool_name(name)) for name in sources}
+
+    frames = []
+    failed = []
+    for name, future in futures.items():
+        try:
+            df = future.result()
+        except Exception as err:
+            print(f"{name}: {err}")
+            df = None
+        if df is None:
+            failed.append(name)
+            continue
+        df.insert(0, 'Source', name)
+        frames.append(df)
+    merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['Source'])
+    return merged, failed
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    sources = load_sources()
+    for analysis in sys.argv[1:] or sorted(ANALYSES):
+        started = time.perf_counter()
+        df, failed = fan_out(analysis, sources)
+        print("=" * 75)
+        print(f"  {analysis.upper()} - {len(sources)} sources, {time.perf_counter() - started:.1f}s")
+        print("=" * 75)
+        print(df.to_string(index=False))
+        if failed:
+            print(f"\n  Failed: {', '.join(failed)}")
@@ -0,0 +1,203 @@
+"""
+PARALLEL TABLE EXTRACTION - READ-ONLY
+Pulls large tables (estimateitemlaborgroups, estimateitems, ...) by splitting
+them into primary-key ranges and fetching the ranges on several connections
+in a process pool, so neither one connection nor one Python decode loop is
+the bottleneck. The ranges are merged into a single pyarrow Table.
+
+Ranges are balanced with a key histogram: MIN/MAX of the key, then one
+index-only GROUP BY over equal-width buckets, then buckets are merged
+greedily into chunks of about the same row count.
+
+Usage:
+    python parallel_extract.py estimateitemlaborgroups --workers 8
+"""
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import mysql.connector
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from fast_fetch import decode_rows
+from powerfab_db import DB_CONFIG, get_pool, local_path
+from schema_graph import PRIMARY_KEYS
+
+EXTRACT_POOL = 'extract'
+BUCKETS_PER_CHUNK = 16
+
+
+def key_histogram(table, key, buckets, where=None):
+    """
+    Row counts per equal-width key bucket.
+
+    Returns:
+        (min_key, max_key, width, {bucket_number: row_count})
+    """
+    where_sql = f"WHERE {where}" if where else ""
+    # A plain connection, not the worker pool: nothing connected is left
+    # behind in the parent for worker processes to share
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM {table} {where_sql}")
+        lo, hi = cursor.fetchone()
+        if lo is None:
+            cursor.close()
+            return None, None, 1, {}
+        width = max(1, -(-(hi - lo + 1) // buckets))
+        cursor.execute(f"""
+            SELECT FLOOR(({key} - %s) / %s) as Bucket, COUNT(*) as NumRows
+            FROM {table} {where_sql}
+            GROUP BY Bucket
+        """, (lo, width))
+        counts = {int(bucket): count for bucket, count in cursor.fetchall()}
+        cursor.close()
+    finally:
+        conn.close()
+    return lo, hi, width, counts
+
+
+def plan_ranges(table, chunks, key=None, where=None):
+    """
+    Split a table into key ranges holding about the same number of rows.
+
+    Args:
+        table: Table name
+        chunks: Target number of ranges
+        key: Integer key column, defaults to PRIMARY_KEYS[table]
+        where: Optional SQL filter applied to the table
+
+    Returns:
+        list of (lo, hi) half-open key ranges [lo, hi)
+    """
+    key = key or PRIMARY_KEYS[table]
+    lo, hi, width, counts = key_histogram(table, key, chunks * BUCKETS_PER_CHUNK, where)
+    if lo is None:
+        return []
+
+    total = sum(counts.values())
+    target = total / chunks
+    ranges = []
+    start = lo
+    filled = 0
+    for bucket in sorted(counts):
+        filled += counts[bucket]
+        if filled >= target and len(ranges) < chunks - 1:
+            end = lo + (bucket + 1) * width
+            ranges.append((start, end))
+            start = end
+            filled = 0
+    ranges.append((start, hi + 1))
+    return ranges
+
+
+def fetch_range(task):
+    """
+    Fetch one key range into a pyarrow RecordBatch (runs in a worker process).
+    Rows are fetched raw and decoded column-wise (see fast_fetch).
+
+    Retries with backoff on connection errors; the pool reconnects a dropped
+    connection when it is handed out again.
+    """
+    table, key, columns, where, lo, hi, retries = task
+    select = ", ".join(columns) if columns else "*"
+    filters = [f"{key} >= %s", f"{key} < %s"] + ([where] if where else [])
+    sql = f"SELECT {select} FROM {table} WHERE {' AND '.join(filters)}"
+
+    for attempt in range(retries + 1):
+        try:
+            conn = get_pool(EXTRACT_POOL, size=1).get_connection()
+            try:
+                cursor = conn.cursor(raw=True)
+                cursor.execute(sql, (lo, hi))
+                description = cursor.description
+                rows = cursor.fetchall()
+                cursor.close()
+            finally:
+                conn.close()
+            break
+        except mysql.connector.Error:
+            if attempt == retries:
+                raise
+            time.sleep(2 ** attempt)
+
+    if not rows:
+        return None
+    return pa.RecordBatch.from_arrays(
+        decode_rows(description, rows), names=[desc[0] for desc in description]
+    )
+
+
+def extract_ranges(table, ranges, workers=4, columns=None, where=None, key=None, retries=3):
+    """
+    Fetch explicit key ranges in parallel.
+
+    Args:
+        table: Table name
+        ranges: list of (lo, hi) half-open key ranges
+        workers: Worker processes (one connection each)
+        columns: Columns to fetch, defaults to all
+        where: Optional SQL filter
+        key: Integer key column, defaults to PRIMARY_KEYS[table]
+        retries: Retries per chunk before giving up
+
+    Returns:
+        list of pyarrow RecordBatches in range order (empty ranges skipped)
+    """
+    key = key or PRIMARY_KEYS[table]
+    tasks = [(table, key, columns, where, lo, hi, retries) for lo, hi in ranges]
+    if not tasks:
+        return []
+    # Spawned, not forked, so a worker never inherits an open pool socket
+    # from the parent (two processes on one socket interleave packets)
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        return [batch for batch in pool.map(fetch_range, tasks) if batch is not None]
+
+
+def extract_table(table, workers=4, chunks=None, columns=None, where=None, key=None, retries=3):
+    """
+    Extract a whole table in parallel.
+
+    Args:
+        table: Table name
+        workers: Worker processes (one connection each)
+        chunks: Number of key ranges, defaults to 4 per worker so a slow
+            range does not leave the other workers idle
+        columns: Columns to fetch, defaults to all
+        where: Optional SQL filter
+        key: Integer key column, defaults to PRIMARY_KEYS[table]
+        retries: Retries per chunk before giving up
+
+    Returns:
+        pyarrow Table in key order
+    """
+    key = key or PRIMARY_KEYS[table]
+    ranges = plan_ranges(table, chunks or workers * 4, key, where)
+    batches = extract_ranges(table, ranges, workers, columns, where, key, retries)
+    if not batches:
+        return pa.table({})
+    return pa.Table.from_batches(batches)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('table')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--chunks', type=int)
+    parser.add_argument('--out', help='Feather file to write (default local_data/extract/<table>.feather)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = extract_table(args.table, workers=args.workers, chunks=args.chunks)
+    elapsed = time.perf_counter() - started
+    out = args.out or local_path('extract', f'{args.table}.feather')
+    feather.write_feather(result, out)
+    print(f"  {args.table}: {result.num_rows} rows, {result.num_columns} columns "
+          f"in {elapsed:.1f}s with {args.workers} workers -> {out}")
@@ -0,0 +1,247 @@
+"""
+ESTIMATE-TO-PRODUCTION PIECE MATCHING - READ-ONLY
+Links estimate lines (estimateitems) to production pieces
+(productioncontrolitems) so estimated vs tracked hours can be compared per
+piece instead of only per job.
+
+Marks are normalized on both sides - split on the 0x01 separator PowerFab
+stores inside marks, each part trimmed, empty parts dropped, rejoined with
+'|' (so 'B1' + '5' and 'B' + '15' stay apart), upper-cased - and then
+hash-joined within each estimate (productioncontroljobs.EstimateID), most
+specific first:
+    main+piece   estimate MainMark and PieceMark = production MainMark and PieceMark
+    piece        estimate piece mark = production PieceMark
+    main         estimate piece mark = production MainMark (assembly-level lines)
+A piece matched by one tier is not offered to the next.
+
+Which estimateitems columns hold the marks varies between installs (see
+docs/schema_estimating.md): MainMark/PieceMark are used when the table has
+them, otherwise PartNumber is the piece mark.
+
+An estimate line matched to several pieces (e.g. jobs sharing an estimate)
+has its hours split by piece quantity. Estimated hours are ManHours x
+Quantity as in similar_pieces; tracked hours are productioncontrolitemstations
+Hours per piece, plus assembly-level completions (no PieceMark) spread over
+the assembly's pieces by quantity. The index is built from the local
+snapshot (or the server) and pickled under local_data/, so a job's piece
+comparison is a lookup.
+
+Usage:
+    python piece_match.py --job ProductionControlID [--rebuild]
+    python piece_match.py --rebuild          (build and print match coverage)
+"""
+import pandas as pd
+
+from arrow_cache import load_columns, load_table
+from powerfab_db import restore_state, store_state
+
+INDEX_FILE = 'piece_match.pkl'
+SEPARATOR = '\x01'
+JOINER = '|'
+TIERS = ['main+piece', 'piece', 'main']
+
+ESTIMATE_COLUMNS = ['EstimateItemID', 'EstimateID', 'Quantity', 'ManHours']
+PIECE_COLUMNS = ['ProductionControlItemID', 'ProductionControlID', 'MainMark', 'PieceMark', 'Quantity']
+STATION_COLUMNS = ['ProductionControlID', 'MainMark', 'PieceMark', 'Hours']
+JOB_COLUMNS = ['ProductionControlID', 'EstimateID']
+
+
+def estimate_mark_columns():
+    """(main mark column or None, piece mark column) in estimateitems."""
+    columns = set(load_columns('estimateitems'))
+    if 'PieceMark' in columns:
+        return ('MainMark' if 'MainMark' in columns else None), 'PieceMark'
+    if 'PartNumber' in columns:
+        return None, 'PartNumber'
+    raise ValueError("estimateitems has no PieceMark or PartNumber column to match on")
+
+
+def normalize_marks(values):
+    """
+    Match keys for a column of marks: split on 0x01, trim the parts, rejoin
+    with JOINER, upper-case. Empty marks become NA (they never match).
+    """
+    marks = pd.Series(values, dtype=object).map(
+        lambda v: v.decode('utf-8', errors='replace') if isinstance(v, (bytes, bytearray)) else v
+    ).astype('string')
+    marks = (marks.str.replace(r'\s+', '', regex=True)
+             .str.replace(f'{SEPARATOR}+', JOINER, regex=True)
+             .str.strip(JOINER).str.upper())
+    return marks.where(marks.str.len() > 0).reset_index(drop=True)
+
+
+class PieceMatchIndex:
+    """Estimate line <-> production piece mapping with hours per piece."""
+
+    def __init__(self):
+        self.mark_columns = None   # (main, piece) columns used on the estimate side
+        self.matches = None        # one row per matched (EstimateItemID, ProductionControlItemID)
+        self.pieces = None         # one row per production piece, indexed by ProductionControlID
+        self.unmatched = None      # estimate lines with no production piece
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        main_col, piece_col = index.mark_columns = estimate_mark_columns()
+
+        items = load_table('estimateitems', ESTIMATE_COLUMNS + [c for c in (main_col, piece_col) if c])
+        estimate = pd.DataFrame({
+            'EstimateItemID': items['EstimateItemID'].astype('int64').to_numpy(),
+            'EstimateID': items['EstimateID'].astype('float64').to_numpy(),
+            'EstMain': normalize_marks(items[main_col]) if main_col else pd.NA,
+            'EstPiece': normalize_marks(items[piece_col]),
+            'EstimatedHours': (items['ManHours'].astype('float64').fillna(0)
+                               * items['Quantity'].astype('float64').fillna(0)).to_numpy(),
+        })
+        estimate['EstMain'] = estimate['EstMain'].astype('string')
+
+        jobs = load_table('productioncontroljobs', JOB_COLUMNS)
+        jobs = pd.DataFrame({c: jobs[c].astype('float64').to_numpy() for c in JOB_COLUMNS})
+
+        raw = load_table('productioncontrolitems', PIECE_COLUMNS)
+        pieces = pd.DataFrame({
+            'ProductionControlItemID': raw['ProductionControlItemID'].astype('int64').to_numpy(),
+            'ProductionControlID': raw['ProductionControlID'].astype('float64').to_numpy(),
+            'MainKey': normalize_marks(raw['MainMark']),
+            'PieceKey': normalize_marks(raw['PieceMark']),
+            'Quantity': raw['Quantity'].astype('float64').fillna(0).to_numpy(),
+        })
+        pieces['EstimateID'] = pieces['ProductionControlID'].map(
+            jobs.dropna().drop_duplicates('ProductionControlID').set_index('ProductionControlID')['EstimateID'])
+
+        # Tracked hours per piece (station completions carry the marks, not the item ID)
+        stations = load_table('productioncontrolitemstations', STATION_COLUMNS)
+        tracked = pd.DataFrame({
+            'ProductionControlID': stations['ProductionControlID'].astype('float64').to_numpy(),
+            'MainKey': normalize_marks(stations['MainMark']),
+            'PieceKey': normalize_marks(stations['PieceMark']),
+            'TrackedHours': stations['Hours'].astype('float64').fillna(0).to_numpy(),
+        }).groupby(['ProductionControlID', 'MainKey', 'PieceKey'], dropna=False)['TrackedHours'].sum()
+        assembly = tracked.loc[tracked.index.get_level_values('PieceKey').isna()].droplevel('PieceKey')
+        pieces = pieces.join(tracked.rename('PieceHours'), on=['ProductionControlID', 'MainKey', 'PieceKey'])
+        # Completions recorded per assembly: spread over its pieces by quantity
+        pieces = pieces.join(assembly.rename('AssemblyHours'), on=['ProductionControlID', 'MainKey'])
+        in_assembly = pieces.groupby(['ProductionControlID', 'MainKey'], dropna=False)['Quantity']
+        total = in_assembly.transform('sum')
+        share = (pieces['Quantity'] / total.where(total > 0)).fillna(1 / in_assembly.transform('size'))
+        pieces['TrackedHours'] = (pieces['PieceHours'].where(pieces['PieceKey'].notna(), 0).fillna(0)
+                                  + pieces['AssemblyHours'].fillna(0) * share)
+        pieces = pieces.drop(columns=['PieceHours', 'AssemblyHours'])
+
+        # Hash joins within each estimate, most specific tier first
+        tier_keys = {
+            'main+piece': (['EstimateID', 'EstMain', 'EstPiece'], ['EstimateID', 'MainKey', 'PieceKey']),
+            'piece': (['EstimateID', 'EstPiece'], ['EstimateID', 'PieceKey']),
+            'main': (['EstimateID', 'EstPiece'], ['EstimateID', 'MainKey']),
+        }
+        candidates = pieces.dropna(subset=['EstimateID'])
+        remaining = estimate.dropna(subset=['EstimateID', 'EstPiece'])
+        found = []
+        for tier in TIERS:
+            left, right = tier_keys[tier]
+            if tier == 'main+piece' and main_col is None:
+                continue
+            pairs = remaining.dropna(subset=left).merge(
+                candidates.dropna(subset=right), left_on=left, right_on=right, suffixes=('', '_piece'))
+            if pairs.empty:
+                continue
+            pairs['MatchType'] = tier
+            found.append(pairs[['EstimateItemID', 'ProductionControlItemID', 'ProductionControlID',
+                                'EstimatedHours', 'Quantity', 'MatchType']])
+            matched_items = pairs['EstimateItemID'].unique()
+            remaining = remaining[~remaining['EstimateItemID'].isin(matched_items)]
+            candidates = candidates[~candidates['ProductionControlItemID'].isin(pairs['ProductionControlItemID'])]
+
+        matches = (pd.concat(found, ignore_index=True) if found else pd.DataFrame(
+            columns=['EstimateItemID', 'ProductionControlItemID', 'ProductionControlID',
+                     'EstimatedHours', 'Quantity', 'MatchType']))
+        # Split each line's hours over its pieces by quantity (evenly if all zero)
+        total = matches.groupby('EstimateItemID')['Quantity'].transform('sum')
+        count = matches.groupby('EstimateItemID')['Quantity'].transform('size')
+        share = (matches['Quantity'] / total.where(total > 0)).fillna(1 / count)
+        matches['EstimatedHours'] = matches['EstimatedHours'] * share
+        matches = matches.drop(columns='Quantity')
+
+        per_piece = matches.groupby('ProductionControlItemID').agg(
+            EstimatedHours=('EstimatedHours', 'sum'), EstimateLines=('EstimateItemID', 'size'),
+            MatchType=('MatchType', 'first'))
+        pieces = pieces.join(per_piece, on='ProductionControlItemID')
+        pieces['EstimateLines'] = pieces['EstimateLines'].fillna(0).astype('int64')
+        pieces = pieces.rename(columns={'MainKey': 'MainMark', 'PieceKey': 'PieceMark'})
+        pieces = pieces.sort_values(['ProductionControlID', 'MainMark', 'PieceMark'], kind='stable')
+
+        index.matches = matches.reset_index(drop=True)
+        index.pieces = pieces.set_index('ProductionControlID')
+        index.unmatched = estimate[~estimate['EstimateItemID'].isin(matches['EstimateItemID'])].reset_index(drop=True)
+        return index
+
+    @classmethod
+    def load(cls, rebuild=False):
+        index = cls()
+        if rebuild or not restore_state(index, INDEX_FILE):
+            index = cls.build()
+            index.save()
+        return index
+
+    def save(self):
+        store_state(self, INDEX_FILE)
+
+    def job(self, production_control_id):
+        """
+        Piece-level estimated vs tracked hours for one job.
+
+        Returns:
+            DataFrame with ProductionControlItemID, MainMark, PieceMark
+            (normalized), Quantity, EstimatedHours (NaN when unmatched),
+            TrackedHours, EstimateLines and MatchType
+        """
+        if production_control_id not in self.pieces.index:
+            return self.pieces.iloc[:0].reset_index()
+        return self.pieces.loc[[production_control_id]].reset_index()
+
+    def coverage(self):
+        """Per-job share of pieces and estimated hours that were matched."""
+        pieces = self.pieces.reset_index()
+        pieces['Matched'] = pieces['EstimateLines'] > 0
+        return pieces.groupby('ProductionControlID').agg(
+            EstimateID=('EstimateID', 'first'), Pieces=('Matched', 'size'), Matched=('Matched', 'sum'),
+            EstimatedHours=('EstimatedHours', 'sum'), TrackedHours=('TrackedHours', 'sum'),
+        ).reset_index()
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--job', type=int, help='ProductionControlID to show piece by piece')
+    parser.add_argument('--rebuild', action='store_true')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = PieceMatchIndex.load(rebuild=args.rebuild)
+    print(f"Index loaded in {time.perf_counter() - started:.1f}s "
+          f"(estimate marks: {' + '.join(c for c in index.mark_columns if c)})")
+    print(f"  {len(index.matches)} matches, {len(index.unmatched)} unmatched estimate lines")
+    for tier, count in index.matches['MatchType'].value_counts().reindex(TIERS, fill_value=0).items():
+        print(f"    {tier:<12} {count:>8}")
+
+    if args.job is None:
+        coverage = index.coverage()
+        print(f"\n  {'Job':>6} {'Pieces':>7} {'Matched':>8} {'Est Hrs':>10} {'Tracked':>10}")
+        for r in coverage.itertuples(index=False):
+            print(f"  {int(r.ProductionControlID):>6} {r.Pieces:>7} {r.Matched:>8} "
+                  f"{r.EstimatedHours:>10.1f} {r.TrackedHours:>10.1f}")
+        sys.exit(0)
+
+    started = time.perf_counter()
+    pieces = index.job(args.job)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"\nJob {args.job}: {len(pieces)} pieces in {elapsed:.1f} ms")
+    print(f"  {'MainMark':<12} {'PieceMark':<14} {'Qty':>5} {'Est Hrs':>9} {'Tracked':>9} {'Match':<11}")
+    for r in pieces.itertuples(index=False):
+        estimated = f"{r.EstimatedHours:>9.2f}" if pd.notna(r.EstimatedHours) else f"{'-':>9}"
+        print(f"  {str(r.MainMark)[:12]:<12} {str(r.PieceMark)[:14]:<14} {r.Quantity:>5.0f} "
+              f"{estimated} {r.TrackedHours:>9.2f} {r.MatchType if pd.notna(r.MatchType) else '':<11}")
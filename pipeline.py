@@ -0,0 +1,300 @@
+"""
+NIGHTLY PRECOMPUTATION PIPELINE - READ-ONLY (server side)
+Runs the local snapshot refresh and everything derived from it as a graph
+of stages instead of by hand.
+
+Each stage names the artifacts it reads and writes:
+    table:<name>    a snapshot table (its manifest entry)
+    <path>          a file or directory under local_data/
+A stage runs after the stages that produce its inputs; stages whose inputs
+are ready run at the same time in a process pool. Before running, a stage's
+key is computed from its code (the stage function plus the source of the
+modules that do the work), arguments and the content hashes of its
+inputs; if the key and the output hashes match the last successful run the
+stage is skipped. State is saved after every stage, so rerunning after a
+failure skips what already finished and resumes at the failed stage.
+Stages marked always=True read the live server and are rerun every time;
+their outputs only change (and so only wake downstream stages) when the
+data did.
+
+Usage:
+    python pipeline.py [--workers N] [--only stage ...] [--force] [--dry-run]
+"""
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from arrow_cache import FACT_TABLES, LOOKUP_TABLES, load_manifest
+from powerfab_db import LOCAL_DIR, local_path
+
+STATE_FILE = 'pipeline_state.json'
+
+
+class Stage:
+    """
+    One pipeline step.
+
+    Args:
+        name: Unique stage name
+        target: 'module:function' run in a worker process
+        inputs: Artifacts read (see module docstring)
+        outputs: Artifacts written
+        kwargs: Keyword arguments for the function (part of the stage key)
+        always: Rerun every time (stages that read the live server)
+        code: Modules whose source is part of the stage key, defaults to
+            the target's module; wrappers in this file name the module
+            they call so edits there rerun the stage
+    """
+
+    def __init__(self, name, target, inputs=(), outputs=(), kwargs=None, always=False, code=None):
+        self.name = name
+        self.target = target
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.kwargs = kwargs or {}
+        self.always = always
+        self.code = list(code) if code is not None else [target.split(':')[0]]
+
+
+def artifact_hash(artifact, manifest=None):
+    """Content hash of an artifact, None if it does not exist."""
+    if artifact.startswith('table:'):
+        entry = (manifest if manifest is not None else load_manifest()).get(artifact[6:])
+        # Snapshot file names are unique per write, so the entry identifies the content
+        return hashlib.sha256(json.dumps(entry, sort_keys=True, default=str).encode()).hexdigest() if entry else None
+
+    path = os.path.join(LOCAL_DIR, artifact)
+    if not os.path.exists(path):
+        return None
+    files = [path] if os.path.isfile(path) else sorted(
+        os.path.join(root, f) for root, _, names in os.walk(path) for f in names)
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(os.path.relpath(file, path).encode())
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def resolve(target):
+    module, function = target.split(':')
+    return getattr(importlib.import_module(module), function)
+
+
+def stage_key(stage, input_hashes):
+    code = [inspect.getsource(resolve(stage.target))]
+    code += [inspect.getsource(importlib.import_module(module)) for module in stage.code]
+    payload = json.dumps([stage.target, code, stage.kwargs, input_hashes], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def run_stage(target, kwargs):
+    """Worker-process entry point."""
+    started = time.perf_counter()
+    resolve(target)(**kwargs)
+    return time.perf_counter() - started
+
+
+def load_state():
+    path = local_path(STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state):
+    tmp = local_path(STATE_FILE + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, local_path(STATE_FILE))
+
+
+def dependencies(stages):
+    """stage name -> names of the stages producing its inputs"""
+    producers = {}
+    for stage in stages:
+        for artifact in stage.outputs:
+            if artifact in producers:
+                raise ValueError(f"{artifact} is produced by both {producers[artifact]} and {stage.name}")
+            producers[artifact] = stage.name
+    deps = {s.name: {producers[a] for a in s.inputs if a in producers} for s in stages}
+
+    # Reject cycles up front rather than waiting forever
+    done = set()
+    while len(done) < len(deps):
+        ready = {n for n, d in deps.items() if n not in done and d <= done}
+        if not ready:
+            raise ValueError(f"Dependency cycle among: {sorted(set(deps) - done)}")
+        done |= ready
+    return deps
+
+
+def up_to_date(stage, key, state):
+    previous = state.get(stage.name)
+    if stage.always or not previous or previous.get('key') != key:
+        return False
+    return all(artifact_hash(a) == previous['outputs'].get(a) for a in stage.outputs)
+
+
+def run_pipeline(stages, workers=4, force=False, dry_run=False):
+    """
+    Run stages in dependency order, in parallel where possible.
+
+    Args:
+        stages: List of Stage
+        workers: Worker processes
+        force: Ignore stored keys and run everything
+        dry_run: Only report what would run
+
+    Returns:
+        dict of stage name -> 'ran', 'skipped', 'failed', 'blocked' (or
+        'would run' for a dry run)
+    """
+    deps = dependencies(stages)
+    by_name = {s.name: s for s in stages}
+    state = load_state()
+    status = {}
+    running = {}
+    keys = {}
+
+    def start_ready(pool):
+        for name, needs in deps.items():
+            if name in status or name in running.values():
+                continue
+            if any(status.get(d) in ('failed', 'blocked') for d in needs):
+                status[name] = 'blocked'
+                print(f"  [blocked] {name}")
+                continue
+            if not all(status.get(d) in ('ran', 'skipped', 'would run') for d in needs):
+                continue
+            stage = by_name[name]
+            inputs = {a: artifact_hash(a) for a in stage.inputs}
+            key = stage_key(stage, inputs)
+            if not force and up_to_date(stage, key, state):
+                status[name] = 'skipped'
+                print(f"  [skip]    {name}")
+            elif dry_run:
+                status[name] = 'would run'
+                print(f"  [run]     {name}")
+            else:
+                print(f"  [start]   {name}")
+                running[pool.submit(run_stage, stage.target, stage.kwargs)] = name
+                keys[name] = key
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            before = len(status)
+            start_ready(pool)
+            if not running:
+                if len(status) == before:
+                    break
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                stage = by_name[name]
+                try:
+                    seconds = future.result()
+                except Exception as err:
+                    status[name] = 'failed'
+                    print(f"  [FAILED]  {name}: {err!r}")
+                    continue
+                status[name] = 'ran'
+                state[name] = {
+                    'key': keys[name],
+                    'outputs': {a: artifact_hash(a) for a in stage.outputs},
+                    'finished': time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'seconds': round(seconds, 1),
+                }
+                save_state(state)
+                print(f"  [done]    {name} ({seconds:.1f}s)")
+    return status
+
+
+# --- nightly stage functions (module-level so worker processes can import them)
+
+def sync_snapshot(tables):
+    from change_detect import sync_table
+    for table in tables:
+        sync_table(table)
+
+
+def build_similar_pieces():
+    from similar_pieces import SimilarPieceIndex
+    SimilarPieceIndex.build().save()
+
+
+def build_piece_match():
+    from piece_match import PieceMatchIndex
+    PieceMatchIndex.build().save()
+
+
+def build_throughput():
+    from throughput import throughput_dashboard
+    throughput_dashboard(refresh=True)
+
+
+def build_report():
+    from report import HTMLRenderer, Report, TOP_SECTIONS
+    with open(local_path('reports', 'nightly.html'), 'w', encoding='utf-8') as f:
+        with Report([HTMLRenderer(f)], 'TIME TRACKING SUMMARY (READ-ONLY)') as report:
+            for title, sql in TOP_SECTIONS:
+                report.query(title, sql)
+
+
+def refresh_state(target):
+    """Load, refresh and save one of the incremental state classes."""
+    resolve(target).load().refresh()
+
+
+NIGHTLY = [
+    Stage('snapshot', 'pipeline:sync_snapshot', kwargs={'tables': FACT_TABLES + LOOKUP_TABLES},
+          outputs=[f'table:{t}' for t in FACT_TABLES + LOOKUP_TABLES], always=True,
+          code=['change_detect']),
+    Stage('sequence_progress', 'pipeline:refresh_state',
+          kwargs={'target': 'sequence_progress:SequenceProgress'},
+          outputs=['sequence_progress.pkl'], always=True, code=['sequence_progress']),
+    Stage('leaderboards', 'pipeline:refresh_state', kwargs={'target': 'leaderboards:Leaderboards'},
+          outputs=['leaderboards.pkl'], always=True, code=['leaderboards']),
+    Stage('labor_rates', 'labor_rates:load_rates', outputs=['labor_rates'], always=True),
+    Stage('throughput', 'pipeline:build_throughput',
+          inputs=['table:productioncontrolitemstations'], outputs=['throughput'], code=['throughput']),
+    Stage('similar_pieces', 'pipeline:build_similar_pieces',
+          inputs=['table:estimateitems', 'table:estimateitemlaborgroups'],
+          outputs=['similar_pieces.pkl'], code=['similar_pieces']),
+    Stage('piece_match', 'pipeline:build_piece_match',
+          inputs=['table:estimateitems', 'table:productioncontroljobs', 'table:productioncontrolitems',
+                  'table:productioncontrolitemstations'],
+          outputs=['piece_match.pkl'], code=['piece_match']),
+    Stage('report', 'pipeline:build_report', outputs=['reports/nightly.html'], always=True,
+          code=['report']),
+]
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--only', nargs='+', help='run just these stages (and skip the rest)')
+    parser.add_argument('--force', action='store_true', help='rerun stages even if up to date')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    stages = [s for s in NIGHTLY if not args.only or s.name in args.only]
+    started = time.perf_counter()
+    status = run_pipeline(stages, workers=args.workers, force=args.force, dry_run=args.dry_run)
+    counts = {}
+    for result in status.values():
+        counts[result] = counts.get(result, 0) + 1
+    print(f"\n{len(status)} stages in {time.perf_counter() - started:.1f}s: "
+          + ", ".join(f"{n} {r}" for r, n in sorted(counts.items())))
+    sys.exit(1 if counts.get('failed') else 0)
@@ -0,0 +1,148 @@
+"""
+SHARED DATABASE ACCESS - READ-ONLY
+Connection settings, pooled connections, the run_query helper and the
+local state files used by the analysis modules. Nothing in here issues
+writes to the server.
+"""
+import os
+import pickle
+
+import mysql.connector
+import mysql.connector.pooling
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', 'localhost'),
+    'port': int(os.getenv('MYSQL_PORT', 3307)),
+    'user': os.getenv('MYSQL_USER', 'admin'),
+    'password': os.getenv('MYSQL_PASSWORD'),
+    'database': os.getenv('MYSQL_DATABASE', 'fabrication'),
+    'use_pure': True,
+    'auth_plugin': 'mysql_native_password'
+}
+
+POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', 4))
+
+# Local state (snapshots, checkpoints, caches) - never written to the server
+LOCAL_DIR = os.getenv('POWERFAB_LOCAL_DIR', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'local_data'))
+
+_pools = {}
+
+
+def local_path(*parts):
+    """Path under LOCAL_DIR, creating the parent directory if needed."""
+    path = os.path.join(LOCAL_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def restore_state(obj, name):
+    """
+    Load an object's attributes pickled by store_state().
+
+    Returns:
+        True if the state file existed and was loaded
+    """
+    path = local_path(name)
+    if not os.path.exists(path):
+        return False
+    with open(path, 'rb') as f:
+        obj.__dict__.update(pickle.load(f))
+    return True
+
+
+def store_state(obj, name):
+    """Pickle an object's attributes under LOCAL_DIR, replacing the file atomically."""
+    tmp = local_path(name + '.tmp')
+    with open(tmp, 'wb') as f:
+        # Plain dict, so the state loads whether or not the class ran as __main__
+        pickle.dump(obj.__dict__, f)
+    os.replace(tmp, local_path(name))
+
+
+def get_pool(name='powerfab', size=POOL_SIZE, config=None, reset_session=True):
+    """
+    Get (or lazily create) a named connection pool.
+
+    Args:
+        name: Pool name - one pool is kept per name for the whole process
+        size: Number of connections in the pool (only used on creation)
+        config: Connection settings, defaults to DB_CONFIG
+        reset_session: Reset session state when a connection is returned.
+            Must be False for pools that keep server-side prepared
+            statements, because a reset deallocates them.
+
+    Returns:
+        mysql.connector.pooling.MySQLConnectionPool
+    """
+    if name not in _pools:
+        _pools[name] = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name=name,
+            pool_size=size,
+            pool_reset_session=reset_session,
+            **(config or DB_CONFIG)
+        )
+    return _pools[name]
+
+
+def get_connection(pool_name='powerfab'):
+    """
+    Get a pooled database connection for manual operations.
+    Calling close() on it returns it to the pool.
+    """
+    return get_pool(pool_name).get_connection()
+
+
+def rows_to_frame(cursor, rows):
+    """Build a DataFrame from fetched rows using the cursor's column names."""
+    columns = [desc[0] for desc in cursor.description]
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+def run_query(query, params=None, pool_name='powerfab'):
+    """
+    Execute a SQL query and return results as a pandas DataFrame.
+
+    Args:
+        query: SQL query string
+        params: Optional tuple of parameters for parameterized queries
+        pool_name: Pool to borrow the connection from
+
+    Returns:
+        pandas DataFrame with query results
+    """
+    try:
+        conn = get_connection(pool_name)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            df = rows_to_frame(cursor, cursor.fetchall())
+            cursor.close()
+        finally:
+            conn.close()
+        return df
+    except mysql.connector.Error as err:
+        print(f"Database error: {err}")
+        return None
+
+
+def table_columns(table, pool_name='powerfab'):
+    """Column names in table order, from INFORMATION_SCHEMA."""
+    conn = get_connection(pool_name)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COLUMN_NAME
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            ORDER BY ORDINAL_POSITION
+        """, (table,))
+        columns = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    finally:
+        conn.close()
+    return columns
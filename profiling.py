@@ -0,0 +1,247 @@
+"""
+OPT-IN PROFILING
+Finds out whether a slow or memory-hungry run is waiting on MySQL, decoding
+rows, building DataFrames or formatting output.
+
+While a Profiler is active:
+    - cProfile records every call (written as .prof, for pstats/snakeviz)
+    - a sampling thread records full stacks every SAMPLE_INTERVAL seconds
+      (written as .folded, the input format of flamegraph.pl and speedscope)
+    - tracemalloc tracks allocations
+    - time spent blocked on the MySQL socket is counted as DB wait
+and every section() and every executed query gets its own line in the
+summary: wall time, DB wait, Python CPU, peak memory growth.
+
+Enable with POWERFAB_PROFILE=1 (entry points that call maybe_profile), or
+run any script under it:
+
+    python profiling.py report.py --format md
+    POWERFAB_PROFILE=1 python report.py
+
+Output goes to local_data/profiles/<name>-<timestamp>.{txt,prof,folded}.
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import mysql.connector.cursor
+import mysql.connector.network
+
+from powerfab_db import local_path
+
+PROFILE_DIR = 'profiles'
+SAMPLE_INTERVAL = 0.005
+QUERY_LABEL = 60
+
+ENABLED = os.getenv('POWERFAB_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+_active = None
+
+
+def query_label(sql):
+    text = " ".join(str(sql).split())
+    return "query: " + (text[:QUERY_LABEL] + "..." if len(text) > QUERY_LABEL else text)
+
+
+class Profiler:
+    """cProfile + stack sampling + tracemalloc, with per-section attribution."""
+
+    def __init__(self, name='run'):
+        self.name = name
+        self.stats = {}          # section -> dict of calls, wall, db_wait, cpu, peak
+        self.stack = []          # open sections: [name, peak seen by children]
+        self.samples = {}        # folded stack -> count
+        self.db_wait = 0.0
+        self.lock = threading.Lock()
+        self.profile = cProfile.Profile()
+        self.patched = []
+        self.sampler = None
+        self.sampling = False
+
+    # --- hooks -------------------------------------------------------------
+
+    def patch(self, owner, attr, wrapper):
+        original = getattr(owner, attr)
+        self.patched.append((owner, attr, original))
+        setattr(owner, attr, wrapper(original))
+
+    def install_hooks(self):
+        profiler = self
+
+        def timed_io(original):
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    with profiler.lock:
+                        profiler.db_wait += time.perf_counter() - started
+            return wrapper
+
+        def traced_execute(original):
+            def wrapper(cursor, operation, *args, **kwargs):
+                with profiler.section(query_label(operation)):
+                    return original(cursor, operation, *args, **kwargs)
+            return wrapper
+
+        self.patch(mysql.connector.network.MySQLSocket, 'recv', timed_io)
+        for cls in (mysql.connector.cursor.MySQLCursor, mysql.connector.cursor.MySQLCursorPrepared):
+            self.patch(cls, 'execute', traced_execute)
+
+    def remove_hooks(self):
+        for owner, attr, original in reversed(self.patched):
+            setattr(owner, attr, original)
+        self.patched = []
+
+    def sample(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while self.sampling:
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join([names.get(ident, str(ident))] + stack[::-1])
+                self.samples[key] = self.samples.get(key, 0) + 1
+            time.sleep(SAMPLE_INTERVAL)
+
+    # --- lifecycle ---------------------------------------------------------
+
+    def start(self):
+        global _active
+        _active = self
+        tracemalloc.start()
+        self.install_hooks()
+        self.sampling = True
+        self.sampler = threading.Thread(target=self.sample, name='profiler', daemon=True)
+        self.sampler.start()
+        self.profile.enable()
+        self.stack.append([self.name, 0])
+        self.started = (time.perf_counter(), time.process_time(), self.db_wait,
+                        tracemalloc.get_traced_memory()[0])
+
+    def stop(self):
+        global _active
+        self.profile.disable()
+        self.sampling = False
+        self.sampler.join()
+        self.remove_hooks()
+        wall, cpu, db_wait, current = self.started
+        self.record(self.name, time.perf_counter() - wall, time.process_time() - cpu,
+                    self.db_wait - db_wait, max(self.stack.pop()[1], tracemalloc.get_traced_memory()[1]) - current)
+        tracemalloc.stop()
+        _active = None
+
+    def record(self, name, wall, cpu, db_wait, peak):
+        entry = self.stats.setdefault(name, {'calls': 0, 'wall': 0.0, 'db_wait': 0.0, 'cpu': 0.0, 'peak': 0})
+        entry['calls'] += 1
+        entry['wall'] += wall
+        entry['db_wait'] += db_wait
+        entry['cpu'] += cpu
+        entry['peak'] = max(entry['peak'], peak)
+
+    @contextmanager
+    def section(self, name):
+        """
+        Attribute everything inside the block to `name` (nested sections
+        are reported as 'outer > inner').
+        """
+        if not self.stack or threading.current_thread() is not threading.main_thread():
+            # Worker threads only count toward DB wait / CPU of the open section
+            yield
+            return
+        full = " > ".join([s[0] for s in self.stack[1:]] + [name])
+        current, peak = tracemalloc.get_traced_memory()
+        self.stack[-1][1] = max(self.stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        self.stack.append([name, 0])
+        wall, cpu, db_wait = time.perf_counter(), time.process_time(), self.db_wait
+        try:
+            yield
+        finally:
+            own_peak = max(self.stack.pop()[1], tracemalloc.get_traced_memory()[1])
+            self.stack[-1][1] = max(self.stack[-1][1], own_peak)
+            self.record(full, time.perf_counter() - wall, time.process_time() - cpu,
+                        self.db_wait - db_wait, own_peak - current)
+
+    # --- output ------------------------------------------------------------
+
+    def summary(self):
+        lines = [f"  {'Section':<70} {'Calls':>6} {'Wall s':>8} {'DB s':>8} {'CPU s':>8} {'Peak MB':>8}"]
+        for name, s in sorted(self.stats.items(), key=lambda item: -item[1]['wall']):
+            lines.append(f"  {name[:70]:<70} {s['calls']:>6} {s['wall']:>8.2f} {s['db_wait']:>8.2f} "
+                         f"{s['cpu']:>8.2f} {s['peak'] / 1e6:>8.1f}")
+        return "\n".join(lines)
+
+    def write(self):
+        """
+        Returns:
+            dict of output kind -> path
+        """
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        base = local_path(PROFILE_DIR, f"{os.path.basename(self.name)}-{stamp}")
+        paths = {'summary': base + '.txt', 'pstats': base + '.prof', 'folded': base + '.folded'}
+        with open(paths['summary'], 'w', encoding='utf-8') as f:
+            f.write(self.summary() + "\n")
+        self.profile.dump_stats(paths['pstats'])
+        with open(paths['folded'], 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        return paths
+
+
+@contextmanager
+def section(name):
+    """Attribute a block to a section when profiling is on; no-op otherwise."""
+    if _active is None:
+        yield
+        return
+    with _active.section(name):
+        yield
+
+
+@contextmanager
+def profile(name='run'):
+    """Profile the block and write the outputs when it ends."""
+    profiler = Profiler(name)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        paths = profiler.write()
+        print("\n" + profiler.summary(), file=sys.stderr)
+        print(f"\nProfile written to {paths['summary']} (.prof, .folded)", file=sys.stderr)
+
+
+@contextmanager
+def maybe_profile(name):
+    """profile(name) if POWERFAB_PROFILE is set, else nothing."""
+    if not ENABLED or _active is not None:
+        yield None
+        return
+    with profile(name) as profiler:
+        yield profiler
+
+
+if __name__ == '__main__':
+    import runpy
+
+    # The script imports this file as 'profiling'; use that module's state
+    import profiling
+
+    if len(sys.argv) < 2:
+        sys.exit("usage: python profiling.py script.py [args ...]")
+    script = sys.argv[1]
+    sys.argv = sys.argv[1:]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    with profiling.profile(os.path.splitext(os.path.basename(script))[0]):
+        runpy.run_path(script, run_name='__main__')
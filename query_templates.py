@@ -0,0 +1,188 @@
+"""
+PREPARED QUERY TEMPLATES - READ-ONLY
+Loads the documented query patterns (SCHEMA_OVERVIEW Patterns 1-6 and the
+QUICK_REFERENCE common patterns) once and runs them as server-side prepared
+statements, so repeat calls skip re-parsing and use the binary protocol.
+"""
+import os
+import re
+import weakref
+
+import mysql.connector
+import pandas as pd
+
+from powerfab_db import get_pool
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docs')
+
+TEMPLATE_POOL = 'templates'
+
+# Unknown statement handler, server gone away, lost connection, SSL connection
+# error: the prepared handle is gone, so prepare again. Anything else (bad
+# parameters, SQL errors) is raised as is.
+REPREPARE_ERRNOS = {1243, 2006, 2013, 2055}
+
+# "### Pattern 3: Total Hours by Station" followed by a ```sql block
+PATTERN_RE = re.compile(r'^### Pattern (\d+): (.+?)\n.*?```sql\n(.*?)```', re.M | re.S)
+# "**Hours by Station:**" followed by a ```sql block
+QUICK_RE = re.compile(r'^\*\*(.+?):\*\*\n```sql\n(.*?)```', re.M | re.S)
+
+
+def slugify(title):
+    """'Estimated vs Actual (Job)' -> 'estimated_vs_actual_job'"""
+    return re.sub(r'[^a-z0-9]+', '_', title.lower()).strip('_')
+
+
+def load_templates(docs_dir=DOCS_DIR):
+    """
+    Parse the documented query patterns out of the schema docs.
+
+    Args:
+        docs_dir: Directory holding SCHEMA_OVERVIEW.md and QUICK_REFERENCE.md
+
+    Returns:
+        dict of template name -> {'title', 'sql', 'params'}, e.g.
+        'pattern_1' for SCHEMA_OVERVIEW patterns and 'quick_hours_by_station'
+        for QUICK_REFERENCE patterns
+    """
+    templates = {}
+
+    with open(os.path.join(docs_dir, 'SCHEMA_OVERVIEW.md'), encoding='utf-8') as f:
+        for number, title, sql in PATTERN_RE.findall(f.read()):
+            templates[f'pattern_{number}'] = {'title': title.strip(), 'sql': sql.strip()}
+
+    with open(os.path.join(docs_dir, 'QUICK_REFERENCE.md'), encoding='utf-8') as f:
+        text = f.read()
+    common = text[text.index('## Common Patterns'):]
+    common = common[:common.find('\n---')]
+    for title, sql in QUICK_RE.findall(common):
+        templates[f'quick_{slugify(title)}'] = {'title': title.strip(), 'sql': sql.strip()}
+
+    for template in templates.values():
+        template['params'] = template['sql'].count('?')
+    return templates
+
+
+class TemplateRegistry:
+    """
+    Runs documented query templates as prepared statements.
+
+    Each template is prepared at most once per pooled connection and the
+    prepared cursor is kept for reuse. The template pool is created with
+    session reset disabled, otherwise returning a connection to the pool
+    would deallocate its statements.
+    """
+
+    def __init__(self, docs_dir=DOCS_DIR, pool_name=TEMPLATE_POOL):
+        self.templates = load_templates(docs_dir)
+        self.pool_name = pool_name
+        # raw connection -> {template name: prepared cursor}
+        self._prepared = weakref.WeakKeyDictionary()
+
+    def names(self):
+        return sorted(self.templates)
+
+    def sql(self, name):
+        return self.templates[name]['sql']
+
+    def _cursor(self, conn, name):
+        cursors = self._prepared.setdefault(conn._cnx, {})
+        if name not in cursors:
+            cursors[name] = conn._cnx.cursor(prepared=True)
+        return cursors[name]
+
+    def _discard(self, conn):
+        """Close and forget every prepared cursor of a connection."""
+        for cursor in self._prepared.pop(conn._cnx, {}).values():
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                # Connection already gone - the server dropped the statements
+                pass
+        if not conn._cnx.is_connected():
+            conn._cnx.reconnect()
+
+    def execute(self, name, params=()):
+        """
+        Execute a template and fetch all rows.
+
+        Args:
+            name: Template name (see names())
+            params: Values for the template's ? placeholders, in order
+
+        Returns:
+            (column names, rows)
+        """
+        template = self.templates[name]
+        if len(params) != template['params']:
+            raise ValueError(
+                f"{name} takes {template['params']} parameter(s), got {len(params)}"
+            )
+
+        conn = get_pool(self.pool_name, reset_session=False).get_connection()
+        try:
+            cursor = self._cursor(conn, name)
+            try:
+                # Same string object every call, so the cursor skips re-preparing
+                cursor.execute(template['sql'], tuple(params))
+            except mysql.connector.Error as err:
+                if err.errno not in REPREPARE_ERRNOS:
+                    raise
+                # Statement handle lost (server restart, reconnect) - prepare again
+                self._discard(conn)
+                cursor = self._cursor(conn, name)
+                cursor.execute(template['sql'], tuple(params))
+            # Read everything before the connection (and its cursors) goes
+            # back to the pool, where another thread may pick it up
+            columns = [desc[0] for desc in cursor.description]
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        return columns, rows
+
+    def query(self, name, params=()):
+        """Execute a template and return a pandas DataFrame."""
+        columns, rows = self.execute(name, params)
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+
+_registry = None
+
+
+def get_registry():
+    """Process-wide registry, so templates are parsed and prepared once."""
+    global _registry
+    if _registry is None:
+        _registry = TemplateRegistry()
+    return _registry
+
+
+def run_template(name, params=()):
+    """
+    Run a documented query template and return a DataFrame.
+
+    Args:
+        name: Template name, e.g. 'pattern_1' or 'quick_hours_by_station'
+        params: Values for the template's ? placeholders
+
+    Returns:
+        pandas DataFrame with query results
+    """
+    return get_registry().query(name, params)
+
+
+if __name__ == '__main__':
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    registry = get_registry()
+    print("=" * 70)
+    print("PREPARED QUERY TEMPLATES")
+    print("=" * 70)
+    print(f"  {'Name':<40} {'Params':>6}  Title")
+    for name in registry.names():
+        template = registry.templates[name]
+        print(f"  {name:<40} {template['params']:>6}  {template['title']}")
+
+    print("\n--- pattern_6: Jobs with Largest Variance ---")
+    print(registry.query('pattern_6').to_string(index=False))
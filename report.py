@@ -0,0 +1,321 @@
+"""
+STREAMING REPORT RENDERER
+Renders section results (title, columns, rows) to console text, Markdown,
+HTML or CSV. Column widths are computed from the first SAMPLE_ROWS rows,
+then rows are written as they arrive, so large sections stream instead of
+being built in memory. One query can feed several outputs at once:
+
+    with Report([ConsoleRenderer(), MarkdownRenderer(open('out.md', 'w'))]) as report:
+        report.query("TIME RECORDS BY STATION", sql)
+
+Usage:
+    python report.py [--format console|md|html|csv ...] [--out-dir DIR]
+"""
+import csv
+import datetime
+import decimal
+import html
+import sys
+
+from powerfab_db import get_connection
+from profiling import maybe_profile, section
+
+SAMPLE_ROWS = 50
+MAX_WIDTH = 40
+FETCH_SIZE = 1000
+
+
+def clean(value):
+    """Text for display: PowerFab marks use 0x01 as a separator."""
+    if value is None:
+        return ''
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8', errors='replace')
+    return str(value).replace('\x01', '')
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return f"{value:.1f}"
+    if isinstance(value, decimal.Decimal):
+        return f"{float(value):.1f}"
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    return clean(value)
+
+
+def is_numeric(value):
+    return isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool)
+
+
+class Renderer:
+    """Base renderer; subclasses write one format to a text stream."""
+
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+
+    def begin_report(self, title):
+        pass
+
+    def begin_section(self, title, columns, sample):
+        pass
+
+    def row(self, values):
+        pass
+
+    def end_section(self, count):
+        pass
+
+    def end_report(self):
+        self.out.flush()
+
+
+class ConsoleRenderer(Renderer):
+    """Fixed-width text in the style of the exploration scripts."""
+
+    def begin_report(self, title):
+        self.out.write("=" * 75 + f"\n  {title}\n" + "=" * 75 + "\n")
+
+    def begin_section(self, title, columns, sample):
+        self.widths = []
+        self.numeric = []
+        for i, name in enumerate(columns):
+            values = [row[i] for row in sample]
+            width = max([len(name)] + [len(format_value(v)) for v in values])
+            numeric = bool(values) and all(is_numeric(v) for v in values if v is not None)
+            self.widths.append(width if numeric else min(width, MAX_WIDTH))
+            self.numeric.append(numeric)
+        self.out.write(f"\n--- {title} ---\n")
+        self.out.write("  " + " ".join(self._cell(n, i) for i, n in enumerate(columns)) + "\n")
+        self.out.write("  " + "-" * (sum(self.widths) + len(self.widths) - 1) + "\n")
+
+    def _cell(self, text, i, clip=True):
+        """Pad to the column width; text past it is cut and marked with '…'.
+        Numbers are never cut (clip=False) - a wider value overflows instead."""
+        width = self.widths[i]
+        if clip and len(text) > width:
+            text = text[:width - 1] + '…'
+        return f"{text:>{width}}" if self.numeric[i] else f"{text:<{width}}"
+
+    def row(self, values):
+        self.out.write("  " + " ".join(self._cell(format_value(v), i, clip=not is_numeric(v))
+                                       for i, v in enumerate(values)) + "\n")
+
+    def end_section(self, count):
+        self.out.write(f"  ({count} rows)\n")
+
+
+class MarkdownRenderer(Renderer):
+
+    def begin_report(self, title):
+        self.out.write(f"# {title}\n")
+
+    def begin_section(self, title, columns, sample):
+        self.out.write(f"\n## {title}\n\n")
+        self.out.write("| " + " | ".join(columns) + " |\n")
+        aligns = []
+        for i in range(len(columns)):
+            values = [row[i] for row in sample if row[i] is not None]
+            aligns.append('---:' if values and all(is_numeric(v) for v in values) else '---')
+        self.out.write("|" + "|".join(aligns) + "|\n")
+
+    def row(self, values):
+        cells = (format_value(v).replace('|', '\\|') for v in values)
+        self.out.write("| " + " | ".join(cells) + " |\n")
+
+    def end_section(self, count):
+        self.out.write(f"\n_{count} rows_\n")
+
+
+class HTMLRenderer(Renderer):
+
+    def begin_report(self, title):
+        self.out.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+                       "<style>table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:2px 6px}"
+                       "td.n{text-align:right}</style></head><body>\n"
+                       f"<h1>{html.escape(title)}</h1>\n")
+
+    def begin_section(self, title, columns, sample):
+        self.numeric = []
+        for i in range(len(columns)):
+            values = [row[i] for row in sample if row[i] is not None]
+            self.numeric.append(bool(values) and all(is_numeric(v) for v in values))
+        self.out.write(f"<h2>{html.escape(title)}</h2>\n<table>\n<tr>"
+                       + "".join(f"<th>{html.escape(c)}</th>" for c in columns) + "</tr>\n")
+
+    def row(self, values):
+        self.out.write("<tr>" + "".join(
+            f"<td class=\"n\">{html.escape(format_value(v))}</td>" if self.numeric[i]
+            else f"<td>{html.escape(format_value(v))}</td>"
+            for i, v in enumerate(values)) + "</tr>\n")
+
+    def end_section(self, count):
+        self.out.write(f"</table>\n<p>{count} rows</p>\n")
+
+    def end_report(self):
+        self.out.write("</body></html>\n")
+        super().end_report()
+
+
+class CSVRenderer(Renderer):
+    """Raw values, one CSV block per section preceded by a '# title' line."""
+
+    def begin_section(self, title, columns, sample):
+        self.writer = csv.writer(self.out, lineterminator='\n')
+        self.out.write(f"# {title}\n")
+        self.writer.writerow(columns)
+
+    def row(self, values):
+        self.writer.writerow([clean(v) for v in values])
+
+    def end_section(self, count):
+        self.out.write("\n")
+
+
+RENDERERS = {
+    'console': ConsoleRenderer,
+    'md': MarkdownRenderer,
+    'html': HTMLRenderer,
+    'csv': CSVRenderer,
+}
+
+
+class Report:
+    """
+    Sends every section to all renderers, streaming rows after the sample.
+
+    Args:
+        renderers: List of Renderer instances
+        title: Report title
+    """
+
+    def __init__(self, renderers, title='POWERFAB REPORT'):
+        self.renderers = renderers
+        self.title = title
+
+    def __enter__(self):
+        for r in self.renderers:
+            r.begin_report(self.title)
+        return self
+
+    def __exit__(self, *exc):
+        for r in self.renderers:
+            r.end_report()
+
+    def section(self, title, columns, rows, sample_size=SAMPLE_ROWS):
+        """
+        Render one section.
+
+        Args:
+            title: Section title
+            columns: Column names
+            rows: Any iterable of row tuples (consumed once)
+            sample_size: Rows buffered to size the columns
+
+        Returns:
+            Number of rows rendered
+        """
+        with section(title):
+            rows = iter(rows)
+            sample = []
+            for row in rows:
+                sample.append(row)
+                if len(sample) >= sample_size:
+                    break
+            for r in self.renderers:
+                r.begin_section(title, columns, sample)
+
+            count = 0
+            for source in (sample, rows):
+                for row in source:
+                    for r in self.renderers:
+                        r.row(row)
+                    count += 1
+            for r in self.renderers:
+                r.end_section(count)
+        return count
+
+    def query(self, title, sql, params=None):
+        """Run a query and stream its rows into a section."""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            columns = [desc[0] for desc in cursor.description]
+            count = self.section(title, columns, iter_rows(cursor))
+            cursor.close()
+        finally:
+            conn.close()
+        return count
+
+    def frame(self, title, df):
+        """Render a pandas DataFrame as a section."""
+        return self.section(title, [str(c) for c in df.columns], df.itertuples(index=False, name=None))
+
+
+def iter_rows(cursor, size=FETCH_SIZE):
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+# The verify_guide3.py "Top 15" sections, all hour types included
+TOP_SECTIONS = [
+    ("TIME RECORDS BY STATION (Top 15)", """
+        SELECT s.StationID, s.Description as Station, COUNT(*) as Records,
+               SUM(tr.RegularHours + tr.OvertimeHours + tr.Overtime2Hours) as TotalHours
+        FROM timerecords tr
+        LEFT JOIN stations s ON tr.StationID = s.StationID
+        GROUP BY s.StationID, s.Description
+        ORDER BY TotalHours DESC
+        LIMIT 15
+    """),
+    ("TIME RECORDS BY PROJECT (Top 15)", """
+        SELECT p.ProjectID, p.JobNumber, p.JobDescription, COUNT(*) as Records,
+               SUM(tr.RegularHours + tr.OvertimeHours + tr.Overtime2Hours) as TotalHours
+        FROM timerecords tr
+        LEFT JOIN projects p ON tr.ProjectID = p.ProjectID
+        GROUP BY p.ProjectID, p.JobNumber, p.JobDescription
+        ORDER BY TotalHours DESC
+        LIMIT 15
+    """),
+    ("TIME RECORDS BY EMPLOYEE (Top 15)", """
+        SELECT u.UserID, CONCAT(COALESCE(u.FirstName, ''), ' ', COALESCE(u.LastName, '')) as Name,
+               COUNT(*) as Records,
+               SUM(tr.RegularHours + tr.OvertimeHours + tr.Overtime2Hours) as TotalHours
+        FROM timerecords tr
+        LEFT JOIN users u ON tr.EmployeeUserID = u.UserID
+        GROUP BY u.UserID, u.FirstName, u.LastName
+        ORDER BY TotalHours DESC
+        LIMIT 15
+    """),
+]
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--format', nargs='+', default=['console'], choices=sorted(RENDERERS))
+    parser.add_argument('--out-dir', help='write non-console formats to report.<ext> here')
+    args = parser.parse_args()
+
+    files = []
+    renderers = []
+    for fmt in args.format:
+        if fmt == 'console' or not args.out_dir:
+            renderers.append(RENDERERS[fmt]())
+        else:
+            f = open(os.path.join(args.out_dir, f'report.{fmt}'), 'w', encoding='utf-8', newline='')
+            files.append(f)
+            renderers.append(RENDERERS[fmt](f))
+
+    with maybe_profile('report'), Report(renderers, 'TIME TRACKING SUMMARY (READ-ONLY)') as report:
+        for title, sql in TOP_SECTIONS:
+            report.query(title, sql)
+    for f in files:
+        f.close()
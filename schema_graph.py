@@ -0,0 +1,134 @@
+"""
+SCHEMA RELATIONSHIP GRAPH
+The inferred (not enforced) relationships between the core PowerFab tables,
+read from powerfab-table-relationships.md so the docs stay the single source.
+"""
+import heapq
+import os
+import re
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RELATIONSHIPS_DOC = os.path.join(BASE_DIR, 'powerfab-table-relationships.md')
+
+# Single-column keys used for ranges and watermarks. estimateitemlaborgroups
+# has a composite key (EstimateItemID, LaborGroupID) - its leading column is used.
+PRIMARY_KEYS = {
+    'projects': 'ProjectID',
+    'users': 'UserID',
+    'stations': 'StationID',
+    'laborgroups': 'LaborGroupID',
+    'stationlaborgroups': 'StationLaborGroupID',
+    'estimates': 'EstimateID',
+    'estimateitems': 'EstimateItemID',
+    'estimateitemlaborgroups': 'EstimateItemID',
+    'productioncontroljobs': 'ProductionControlID',
+    'productioncontrolitems': 'ProductionControlItemID',
+    'productioncontrolsequences': 'SequenceID',
+    'productioncontrolitemstations': 'ProductionControlItemStationID',
+    'timerecords': 'TimeRecordID',
+}
+
+# Full unique keys where the single-column key above is not unique
+UNIQUE_KEYS = {
+    'estimateitemlaborgroups': ['EstimateItemID', 'LaborGroupID'],
+}
+
+# Relationships documented in docs/schema_*.md but missing from the summary table
+EXTRA_RELATIONSHIPS = [
+    ('estimates', 'ProjectID', 'projects', 'ProjectID', 'Estimate belongs to project'),
+    ('estimateitemlaborgroups', 'EstimateItemID', 'estimateitems', 'EstimateItemID', 'Labor split of an item'),
+    ('estimateitemlaborgroups', 'LaborGroupID', 'laborgroups', 'LaborGroupID', 'Labor group of the split'),
+    ('productioncontrolsequences', 'ProductionControlID', 'productioncontroljobs', 'ProductionControlID', 'Sequence belongs to job'),
+    ('productioncontrolitemstations', 'UserID', 'users', 'UserID', 'Who completed the piece'),
+]
+
+# | `timerecords` | `ProjectID` | `projects` | `ProjectID` | Which job |
+ROW_RE = re.compile(r'^\| `(\w+)` \| `(\w+)` \| `(\w+)` \| `(\w+)` \| (.+?) \|$', re.M)
+
+
+def load_relationships(path=RELATIONSHIPS_DOC):
+    """
+    Read the "Key Relationships Summary" table plus EXTRA_RELATIONSHIPS.
+
+    Returns:
+        list of (child_table, child_column, parent_table, parent_column, meaning)
+        tuples, one per inferred foreign key
+    """
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    summary = text[text.index('## Key Relationships Summary'):]
+    relationships = [tuple(row) for row in ROW_RE.findall(summary)]
+
+    seen = {rel[:4] for rel in relationships}
+    for rel in EXTRA_RELATIONSHIPS:
+        if rel[:4] not in seen:
+            relationships.append(rel)
+    return relationships
+
+
+# Walking child -> parent keeps one row per child row; parent -> child fans
+# out, so those steps are only taken when no many-to-one path exists
+MANY_TO_ONE_COST = 1
+FAN_OUT_COST = 10
+
+
+def adjacency(relationships=None):
+    """
+    Undirected join graph.
+
+    Returns:
+        dict of table -> list of (neighbour, own column, neighbour column, cost)
+    """
+    graph = {}
+    for child, child_col, parent, parent_col, _ in relationships or load_relationships():
+        graph.setdefault(child, []).append((parent, child_col, parent_col, MANY_TO_ONE_COST))
+        graph.setdefault(parent, []).append((child, parent_col, child_col, FAN_OUT_COST))
+    return graph
+
+
+def join_tree(start, targets, graph=None):
+    """
+    Cheapest join paths from one table to several others (Dijkstra).
+
+    Paths share prefixes, so each table appears once in the tree.
+
+    Args:
+        start: Table the paths start from (e.g. the fact table)
+        targets: Tables that must be reached
+        graph: Output of adjacency(), built from the docs when omitted
+
+    Returns:
+        list of (from_table, from_column, to_table, to_column, fans_out)
+        steps in join order
+
+    Raises:
+        ValueError: if a target cannot be reached
+    """
+    graph = graph or adjacency()
+    best = {start: 0}
+    previous = {}
+    queue = [(0, start)]
+    while queue:
+        cost, table = heapq.heappop(queue)
+        if cost > best[table]:
+            continue
+        for neighbour, own_col, other_col, step in graph.get(table, ()):
+            if cost + step < best.get(neighbour, float('inf')):
+                best[neighbour] = cost + step
+                previous[neighbour] = (table, own_col, other_col, step == FAN_OUT_COST)
+                heapq.heappush(queue, (cost + step, neighbour))
+
+    steps = []
+    seen = {start}
+    for target in targets:
+        if target not in best:
+            raise ValueError(f"No documented join path from {start} to {target}")
+        path = []
+        table = target
+        while table not in seen:
+            source, own_col, other_col, fans_out = previous[table]
+            path.append((source, own_col, table, other_col, fans_out))
+            seen.add(table)
+            table = source
+        steps.extend(reversed(path))
+    return steps
@@ -0,0 +1,184 @@
+"""
+SEQUENCE / LOT COMPLETION TRACKER - READ-ONLY
+Completion % per sequence, lot and job at each station, maintained
+incrementally.
+
+Required quantity per sequence comes from productioncontrolitems (one
+aggregate query, redone only when the bill of materials changes). A
+station counts as required for every sequence of a job once the job has
+any completion at that station. Completions from productioncontrolitemstations
+are applied as deltas above a stored key watermark, so a refresh costs time
+proportional to the new completions, not to the size of the job.
+
+Usage:
+    python sequence_progress.py [--job ProductionControlID]
+"""
+import pandas as pd
+
+from powerfab_db import get_connection, restore_state, store_state
+
+STATE_FILE = 'sequence_progress.pkl'
+
+
+class SequenceProgress:
+    """Incrementally maintained completion counters per (SequenceID, StationID)."""
+
+    def __init__(self):
+        self.sequences = {}       # SequenceID -> (ProductionControlID, Description, LotNumber)
+        self.seq_quantity = {}    # SequenceID -> required pieces
+        self.completed = {}       # (SequenceID, StationID) -> completed pieces
+        self.job_stations = {}    # ProductionControlID -> set of StationIDs
+        self.items_fingerprint = None
+        self.watermark = 0
+
+    @classmethod
+    def load(cls):
+        progress = cls()
+        restore_state(progress, STATE_FILE)
+        return progress
+
+    def save(self):
+        store_state(self, STATE_FILE)
+
+    def refresh_requirements(self, cursor):
+        """Recompute required quantities if the bill of materials changed."""
+        # Totals alone miss items moving between sequences; the checksum of
+        # (item, sequence, quantity) changes with any of them
+        cursor.execute("""
+            SELECT
+                COUNT(*),
+                MAX(ProductionControlItemID),
+                SUM(Quantity),
+                SUM(CRC32(CONCAT_WS(':', ProductionControlItemID, SequenceID, Quantity))),
+                (SELECT COUNT(*) FROM productioncontrolsequences)
+            FROM productioncontrolitems
+        """)
+        fingerprint = tuple(str(v) for v in cursor.fetchone())
+        if fingerprint == self.items_fingerprint:
+            return False
+
+        cursor.execute("""
+            SELECT
+                pcs.SequenceID,
+                pcs.ProductionControlID,
+                pcs.Description,
+                pcs.LotNumber,
+                COALESCE(SUM(pci.Quantity), 0) as Required
+            FROM productioncontrolsequences pcs
+            LEFT JOIN productioncontrolitems pci ON pcs.SequenceID = pci.SequenceID
+            GROUP BY pcs.SequenceID, pcs.ProductionControlID, pcs.Description, pcs.LotNumber
+        """)
+        self.sequences = {}
+        self.seq_quantity = {}
+        for seq_id, job_id, description, lot, required in cursor.fetchall():
+            self.sequences[seq_id] = (job_id, description, lot)
+            self.seq_quantity[seq_id] = float(required)
+        self.items_fingerprint = fingerprint
+        return True
+
+    def apply(self, completions):
+        """
+        Apply completion rows as deltas.
+
+        Args:
+            completions: iterable of (ItemStationID, ProductionControlID,
+                SequenceID, StationID, Quantity)
+        """
+        count = 0
+        for item_station_id, job_id, seq_id, station_id, quantity in completions:
+            self.watermark = max(self.watermark, item_station_id)
+            if seq_id is None or not quantity:
+                continue
+            key = (seq_id, station_id)
+            self.completed[key] = self.completed.get(key, 0.0) + float(quantity)
+            self.job_stations.setdefault(job_id, set()).add(station_id)
+            count += 1
+        return count
+
+    def refresh(self, batch_size=10_000):
+        """
+        Bring the counters up to date.
+
+        Returns:
+            Number of completions applied
+        """
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            self.refresh_requirements(cursor)
+            cursor.execute("""
+                SELECT ProductionControlItemStationID, ProductionControlID,
+                       SequenceID, StationID, Quantity
+                FROM productioncontrolitemstations
+                WHERE ProductionControlItemStationID > %s
+                ORDER BY ProductionControlItemStationID
+            """, (self.watermark,))
+            applied = 0
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                applied += self.apply(rows)
+            cursor.close()
+        finally:
+            conn.close()
+        self.save()
+        return applied
+
+    def sequence_progress(self, job=None):
+        """
+        Completion per (sequence, station).
+
+        Args:
+            job: Optional ProductionControlID filter
+
+        Returns:
+            DataFrame with ProductionControlID, SequenceID, Sequence, LotNumber,
+            StationID, Required, Completed and PctComplete
+        """
+        rows = []
+        for seq_id, (job_id, description, lot) in self.sequences.items():
+            if job is not None and job_id != job:
+                continue
+            required = self.seq_quantity.get(seq_id, 0.0)
+            for station_id in self.job_stations.get(job_id, ()):
+                done = self.completed.get((seq_id, station_id), 0.0)
+                rows.append((job_id, seq_id, description, lot, station_id, required, min(done, required)))
+        df = pd.DataFrame(rows, columns=['ProductionControlID', 'SequenceID', 'Sequence', 'LotNumber',
+                                         'StationID', 'Required', 'Completed'])
+        df['PctComplete'] = (100 * df['Completed'] / df['Required'].where(df['Required'] > 0)).round(1)
+        return df
+
+    def _rollup(self, keys, job=None):
+        df = self.sequence_progress(job)
+        out = df.groupby(keys, dropna=False)[['Required', 'Completed']].sum().reset_index()
+        out['PctComplete'] = (100 * out['Completed'] / out['Required'].where(out['Required'] > 0)).round(1)
+        return out
+
+    def lot_progress(self, job=None):
+        """Completion per (job, lot, station)."""
+        return self._rollup(['ProductionControlID', 'LotNumber', 'StationID'], job)
+
+    def job_progress(self, job=None):
+        """Completion per (job, station)."""
+        return self._rollup(['ProductionControlID', 'StationID'], job)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--job', type=int, help='ProductionControlID')
+    args = parser.parse_args()
+
+    progress = SequenceProgress.load()
+    applied = progress.refresh()
+    print(f"  Applied {applied} new completions (watermark {progress.watermark})")
+
+    print("\n--- Job completion by station ---")
+    print(progress.job_progress(args.job).to_string(index=False))
+    if args.job is not None:
+        print("\n--- Sequence completion by station ---")
+        print(progress.sequence_progress(args.job).to_string(index=False))
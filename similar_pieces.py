@@ -0,0 +1,190 @@
+"""
+SIMILAR-PIECE SEARCH - READ-ONLY
+"What did pieces like this take before?" as a k-nearest-neighbour lookup
+over every historical estimate item, instead of LIKE filters on estimateitems.
+
+Each item becomes a feature vector:
+    - log length, log weight, log quantity, standardized
+    - its labor split: share of the item's hours in each labor group
+      (estimateitemlaborgroups), weighted by LABOR_WEIGHT
+Items are bucketed by ShapeID (a different shape is never "similar"), and a
+query is one vectorized distance pass over its bucket - a few milliseconds
+for the largest shapes. The index is built from the local snapshot (or the
+server) and pickled under local_data/.
+
+Results carry the estimated hours (ManHours x Quantity) and, for estimates
+that went into production, actual hours prorated from the job's actual vs
+estimated total - time is only recorded per job and station, not per piece.
+
+Usage:
+    python similar_pieces.py --shape 12 --length 240 --weight 850 [--quantity 2] [--k 10] [--rebuild]
+"""
+import numpy as np
+import pandas as pd
+
+from arrow_cache import load_table
+from powerfab_db import restore_state, run_query, store_state
+
+INDEX_FILE = 'similar_pieces.pkl'
+ITEM_COLUMNS = ['EstimateItemID', 'EstimateID', 'ShapeID', 'Length', 'Weight', 'Quantity', 'ManHours']
+LABOR_COLUMNS = ['EstimateItemID', 'LaborGroupID', 'ManHours']
+NUMERIC = ['Length', 'Weight', 'Quantity']
+LABOR_WEIGHT = 0.5
+
+ACTUAL_BY_ESTIMATE = """
+    SELECT j.EstimateID, SUM(a.Hours) as ActualHours
+    FROM (
+        SELECT DISTINCT EstimateID, ProjectID
+        FROM productioncontroljobs
+        WHERE EstimateID IS NOT NULL
+    ) j
+    JOIN (
+        SELECT ProjectID, SUM(RegularHours + OvertimeHours + Overtime2Hours) as Hours
+        FROM timerecords
+        GROUP BY ProjectID
+    ) a ON a.ProjectID = j.ProjectID
+    GROUP BY j.EstimateID
+"""
+
+
+def numeric_features(values):
+    """log1p of the NUMERIC attributes, negative/missing treated as 0."""
+    return np.log1p(np.clip(np.nan_to_num(np.asarray(values, dtype='float64')), 0, None))
+
+
+class SimilarPieceIndex:
+    """Per-shape feature matrices over historical estimate items."""
+
+    def __init__(self):
+        self.items = None          # DataFrame, one row per item, index aligned with the matrices
+        self.labor_groups = None   # LaborGroupID per labor-share column
+        self.center = None         # mean / scale of the numeric features
+        self.scale = None
+        self.buckets = {}          # ShapeID -> (row numbers into items, float32 feature matrix)
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        items = load_table('estimateitems', ITEM_COLUMNS)
+        items = pd.DataFrame({c: items[c].astype('float64') for c in ITEM_COLUMNS})
+        items = items.dropna(subset=['EstimateItemID', 'ShapeID']).sort_values('EstimateItemID')
+        items = items.reset_index(drop=True)
+        items['EstimatedHours'] = items['ManHours'].fillna(0) * items['Quantity'].fillna(0)
+
+        # Actual hours, prorated by the job's actual/estimated ratio
+        actual = run_query(ACTUAL_BY_ESTIMATE)
+        estimated = items.groupby('EstimateID')['EstimatedHours'].sum()
+        if actual is not None and len(actual):
+            ratio = (actual.set_index('EstimateID')['ActualHours'].astype('float64')
+                     / estimated.where(estimated > 0))
+            items['ActualHours'] = items['EstimatedHours'] * items['EstimateID'].map(ratio)
+        else:
+            items['ActualHours'] = np.nan
+
+        # Labor split matrix: items x labor groups, as shares of the item's hours
+        labor = load_table('estimateitemlaborgroups', LABOR_COLUMNS)
+        item_ids = labor['EstimateItemID'].astype('float64').to_numpy()
+        group_ids = labor['LaborGroupID'].astype('float64').to_numpy()
+        hours = labor['ManHours'].astype('float64').fillna(0).to_numpy()
+        groups = np.unique(group_ids[~np.isnan(group_ids)])
+        rows = np.searchsorted(items['EstimateItemID'].to_numpy(), item_ids)
+        found = (rows < len(items)) & (items['EstimateItemID'].to_numpy()[np.minimum(rows, len(items) - 1)] == item_ids)
+        split = np.zeros((len(items), len(groups)))
+        np.add.at(split, (rows[found], np.searchsorted(groups, group_ids[found])), hours[found])
+        totals = split.sum(axis=1, keepdims=True)
+        split = np.divide(split, totals, out=np.zeros_like(split), where=totals > 0)
+
+        numeric = numeric_features(items[NUMERIC].to_numpy())
+        index.center = numeric.mean(axis=0)
+        index.scale = numeric.std(axis=0)
+        index.scale[index.scale == 0] = 1
+        features = np.hstack([(numeric - index.center) / index.scale, split * LABOR_WEIGHT]).astype('float32')
+
+        shapes = items['ShapeID'].to_numpy()
+        order = np.argsort(shapes, kind='stable')
+        bounds = np.flatnonzero(np.diff(shapes[order])) + 1
+        for part in np.split(order, bounds):
+            index.buckets[shapes[part[0]]] = (part, features[part])
+        index.items = items
+        index.labor_groups = groups
+        return index
+
+    @classmethod
+    def load(cls, rebuild=False):
+        index = cls()
+        if rebuild or not restore_state(index, INDEX_FILE):
+            index = cls.build()
+            index.save()
+        return index
+
+    def save(self):
+        store_state(self, INDEX_FILE)
+
+    def query(self, shape_id, length, weight, quantity=1, labor_hours=None, k=10):
+        """
+        The k most similar historical items of the same shape.
+
+        Args:
+            shape_id: estimateitems.ShapeID
+            length, weight, quantity: Attributes of the new piece
+            labor_hours: Optional dict of LaborGroupID -> estimated hours;
+                without it only the size attributes are compared
+            k: Number of neighbours
+
+        Returns:
+            DataFrame of the neighbours (EstimateItemID, EstimateID, attributes,
+            EstimatedHours, ActualHours, Distance), nearest first
+        """
+        if shape_id not in self.buckets:
+            return self.items.iloc[:0].assign(Distance=pd.Series(dtype='float64'))
+        rows, features = self.buckets[shape_id]
+        target = (numeric_features([length, weight, quantity]) - self.center) / self.scale
+        dims = len(NUMERIC)
+        if labor_hours:
+            split = np.zeros(len(self.labor_groups))
+            for group, value in labor_hours.items():
+                position = np.searchsorted(self.labor_groups, group)
+                if position < len(self.labor_groups) and self.labor_groups[position] == group:
+                    split[position] = value
+            if split.sum() > 0:
+                split = split / split.sum()
+            target = np.concatenate([target, split * LABOR_WEIGHT])
+            dims = features.shape[1]
+
+        diff = features[:, :dims] - target.astype('float32')
+        distance = np.einsum('ij,ij->i', diff, diff)
+        k = min(k, len(rows))
+        nearest = np.argpartition(distance, k - 1)[:k]
+        nearest = nearest[np.argsort(distance[nearest])]
+        result = self.items.iloc[rows[nearest]].copy()
+        result['Distance'] = np.sqrt(distance[nearest])
+        return result.reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shape', type=float, required=True)
+    parser.add_argument('--length', type=float, required=True)
+    parser.add_argument('--weight', type=float, required=True)
+    parser.add_argument('--quantity', type=float, default=1)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--rebuild', action='store_true')
+    args = parser.parse_args()
+
+    index = SimilarPieceIndex.load(rebuild=args.rebuild)
+    started = time.perf_counter()
+    result = index.query(args.shape, args.length, args.weight, args.quantity, k=args.k)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    print(f"{len(result)} similar items (shape {args.shape:g}) in {elapsed:.1f} ms")
+    print(f"  {'ItemID':>10} {'EstID':>7} {'Length':>9} {'Weight':>10} {'Qty':>5} "
+          f"{'Est Hrs':>9} {'Act Hrs':>9} {'Dist':>6}")
+    for r in result.itertuples(index=False):
+        actual = f"{r.ActualHours:>9.1f}" if pd.notna(r.ActualHours) else f"{'-':>9}"
+        print(f"  {r.EstimateItemID:>10.0f} {r.EstimateID:>7.0f} {r.Length:>9.1f} {r.Weight:>10.1f} "
+              f"{r.Quantity:>5.0f} {r.EstimatedHours:>9.1f} {actual} {r.Distance:>6.2f}")
@@ -0,0 +1,254 @@
+"""
+QUERY GUARDRAIL - READ-ONLY
+Vets ad-hoc and generated SQL before it reaches the production server.
+
+Every SELECT is EXPLAINed first and the rows it would examine are estimated
+from the plan (nested-loop fan-out of rows x filtered per query block).
+Within ROW_BUDGET the query runs as-is. Over budget, plain row listings
+(no grouping, ordering or aggregates) are rewritten:
+
+    1. date pushdown - timerecords / productioncontrolitemstations without
+       a filter on their date column are restricted to the last GUARD_DAYS
+    2. LIMIT - LIMIT ROW_LIMIT, which stops the scan early
+
+Anything else over budget is rejected - rewriting an aggregate would change
+its answer (a full-history SUM quietly becoming last-year), not just its
+size. Leading comments and parentheses are ignored when deciding what a
+statement is, and anything that is not a SELECT/WITH query is rejected
+rather than run unvetted. Every statement carries a
+MAX_EXECUTION_TIME hint so a bad estimate still cannot pin the server, and
+each decision is appended to local_data/sql_guard.log (JSON lines).
+
+Usage:
+    from sql_guard import run_query          # drop-in for powerfab_db.run_query
+    python sql_guard.py "SELECT ..."         # show the decision without running
+"""
+import json
+import os
+import re
+import time
+from datetime import date, timedelta
+
+import mysql.connector
+
+from powerfab_db import get_connection, local_path, rows_to_frame
+
+ROW_BUDGET = int(os.getenv('POWERFAB_ROW_BUDGET', 5_000_000))
+MAX_EXECUTION_MS = int(os.getenv('POWERFAB_MAX_EXECUTION_MS', 60_000))
+GUARD_DAYS = int(os.getenv('POWERFAB_GUARD_DAYS', 365))
+ROW_LIMIT = 100_000
+LOG_FILE = 'sql_guard.log'
+
+# Tables whose date column can be pushed down when a query is too expensive
+DATE_COLUMNS = {
+    'timerecords': 'StartDate',
+    'productioncontrolitemstations': 'DateCompleted',
+}
+
+KEYWORDS = {'WHERE', 'ON', 'USING', 'JOIN', 'LEFT', 'RIGHT', 'INNER', 'OUTER', 'CROSS',
+            'STRAIGHT_JOIN', 'NATURAL', 'GROUP', 'ORDER', 'HAVING', 'LIMIT', 'UNION', 'WINDOW'}
+SELECT_RE = re.compile(r'^\s*SELECT\b', re.I)
+VETTED_RE = re.compile(r'^[\s(]*(SELECT|WITH)\b', re.I)
+# Leading whitespace and comments: -- ..., # ..., /* ... */
+LEADING_RE = re.compile(r'^(\s+|--[^\n]*(\n|$)|#[^\n]*(\n|$)|/\*.*?\*/)+', re.S)
+LIMIT_RE = re.compile(r'\bLIMIT\s+\d+(\s*,\s*\d+|\s+OFFSET\s+\d+)?\s*$', re.I)
+SHAPED_RE = re.compile(r'\b(GROUP\s+BY|ORDER\s+BY|DISTINCT|UNION|SUM|COUNT|AVG|MIN|MAX)\b', re.I)
+
+
+class QueryRejected(Exception):
+    """Raised by vet() when a query stays over budget after rewriting."""
+
+
+def rows_examined(plan):
+    """
+    Estimated rows examined from tabular EXPLAIN rows.
+
+    Within a query block each table is read once per row produced by the
+    tables before it; blocks (subqueries, derived tables) add up.
+    """
+    total = 0.0
+    fanout = {}
+    for row in plan:
+        rows = float(row['rows'] or 0)
+        prefix = fanout.get(row['id'], 1.0)
+        total += prefix * rows
+        fanout[row['id']] = prefix * rows * float(row['filtered'] or 100) / 100
+    return int(total)
+
+
+def strip_leading(sql):
+    """The statement without leading whitespace and comments."""
+    return LEADING_RE.sub('', sql, count=1)
+
+
+def explain(cursor, sql, params=None):
+    cursor.execute("EXPLAIN " + sql, params)
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def push_down_dates(sql, days=GUARD_DAYS):
+    """
+    Replace unfiltered date-bearing tables with a recent-rows derived table.
+
+    MySQL merges the derived table into the outer query, so this is the same
+    as adding the condition to its WHERE clause, without having to parse it.
+
+    Returns:
+        (sql, list of pushed-down tables)
+    """
+    since = (date.today() - timedelta(days=days)).isoformat()
+    pushed = []
+    for table, column in DATE_COLUMNS.items():
+        if re.search(rf'\b{column}\b', sql, re.I):
+            continue
+
+        def derive(match):
+            alias = match.group(3)
+            if not alias or alias.upper() in KEYWORDS:
+                alias = None
+            derived = f"{match.group(1)} (SELECT * FROM {table} WHERE {column} >= '{since}') {alias or table}"
+            return derived if alias else derived + (match.group(2) or '')
+
+        sql, count = re.subn(
+            rf'\b(FROM|JOIN)\s+`?{table}`?\b(\s+(?:AS\s+)?(\w+))?', derive, sql, flags=re.I)
+        if count:
+            pushed.append(f"{table}.{column} >= {since}")
+    return sql, pushed
+
+
+def add_limit(sql, limit=ROW_LIMIT):
+    """LIMIT for plain row listings; None when a LIMIT would not bound the work."""
+    sql = sql.rstrip().rstrip(';')
+    if LIMIT_RE.search(sql) or SHAPED_RE.search(sql):
+        return None
+    return f"{sql}\nLIMIT {int(limit)}"
+
+
+def add_hint(sql, max_ms=MAX_EXECUTION_MS):
+    """
+    Add a MAX_EXECUTION_TIME optimizer hint to a top-level SELECT.
+
+    Returns:
+        (sql, hinted) - hinted is False for statements (e.g. WITH ...) where
+        the hint has no fixed place; run_query uses the session limit instead
+    """
+    if not SELECT_RE.match(sql):
+        return sql, False
+    return SELECT_RE.sub(f"SELECT /*+ MAX_EXECUTION_TIME({int(max_ms)}) */", sql, count=1), True
+
+
+def log_decision(decision):
+    with open(local_path(LOG_FILE), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(decision, default=str) + "\n")
+
+
+def vet(cursor, sql, params=None, budget=None):
+    """
+    Decide whether (and in what form) a query may run.
+
+    Args:
+        cursor: Open cursor used for EXPLAIN
+        sql: Query text
+        params: Query parameters
+        budget: Rows examined allowed, defaults to ROW_BUDGET
+
+    Returns:
+        decision dict with 'action' (allow, rewrite), 'sql' to run,
+        'estimate' and 'rewrites'
+
+    Raises:
+        QueryRejected: if the statement is not a SELECT/WITH query, or is
+            still over budget after rewriting
+    """
+    budget = budget or ROW_BUDGET
+    decision = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'budget': budget,
+                'original': sql.strip(), 'rewrites': []}
+    sql = strip_leading(sql)
+    if not VETTED_RE.match(sql):
+        decision.update(action='reject', sql=sql, estimate=None)
+        log_decision(decision)
+        raise QueryRejected("Only SELECT / WITH queries can be vetted and run through the guard.")
+
+    estimate = rows_examined(explain(cursor, sql, params))
+    decision['estimate'] = estimate
+    if estimate > budget and not SHAPED_RE.search(sql):
+        # Row listings only: on an aggregate this would change the answer
+        rewritten, pushed = push_down_dates(sql)
+        if pushed:
+            sql = rewritten
+            estimate = rows_examined(explain(cursor, sql, params))
+            decision['rewrites'].extend(f"date filter {p}" for p in pushed)
+    if estimate > budget:
+        limited = add_limit(sql)
+        if limited:
+            sql = limited
+            decision['rewrites'].append(f"LIMIT {ROW_LIMIT}")
+        else:
+            decision.update(action='reject', sql=sql, final_estimate=estimate)
+            log_decision(decision)
+            raise QueryRejected(
+                f"Query would examine ~{estimate:,} rows (budget {budget:,}). "
+                f"Filter on an indexed key or a date range, or raise POWERFAB_ROW_BUDGET.")
+    decision.update(action='rewrite' if decision['rewrites'] else 'allow',
+                    sql=sql, final_estimate=estimate)
+    log_decision(decision)
+    return decision
+
+
+def run_query(query, params=None, pool_name='powerfab', budget=None, max_ms=MAX_EXECUTION_MS):
+    """
+    Guarded powerfab_db.run_query: vet, rewrite if needed, run with a time limit.
+
+    Returns:
+        pandas DataFrame with query results, or None if the query was
+        rejected or failed (the reason is printed, like run_query)
+    """
+    try:
+        conn = get_connection(pool_name)
+        try:
+            cursor = conn.cursor()
+            decision = vet(cursor, query, params, budget)
+            for rewrite in decision['rewrites']:
+                print(f"Guardrail: {rewrite} (estimated {decision['estimate']:,} rows examined)")
+            sql, hinted = add_hint(decision['sql'], max_ms)
+            if not hinted:
+                cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {int(max_ms)}")
+            try:
+                cursor.execute(sql, params)
+                df = rows_to_frame(cursor, cursor.fetchall())
+            finally:
+                if not hinted:
+                    cursor.execute("SET SESSION MAX_EXECUTION_TIME = DEFAULT")
+            cursor.close()
+        finally:
+            conn.close()
+        return df
+    except QueryRejected as err:
+        print(f"Query rejected: {err}")
+        return None
+    except mysql.connector.Error as err:
+        print(f"Database error: {err}")
+        return None
+
+
+if __name__ == '__main__':
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    sql = sys.argv[1] if len(sys.argv) > 1 else sys.stdin.read()
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            decision = vet(cursor, sql)
+        except QueryRejected as err:
+            print(f"REJECTED: {err}")
+        else:
+            print(f"{decision['action'].upper()}: estimated {decision['estimate']} rows examined")
+            for rewrite in decision['rewrites']:
+                print(f"  - {rewrite}")
+            print(add_hint(decision['sql'])[0])
+        cursor.close()
+    finally:
+        conn.close()
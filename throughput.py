@@ -0,0 +1,168 @@
+"""
+STATION THROUGHPUT AND CYCLE TIMES
+Plant-wide time series built from productioncontrolitemstations in one
+vectorized pass (sorted group operations, no per-row Python):
+
+  - daily and rolling pieces/hour per station
+  - cycle time between consecutive stations for the same MainMark
+  - queue-time distribution per station (elapsed time between stations
+    less the hours recorded at the station)
+
+Pattern 5 gives one pieces/hour number per station for one job; this covers
+every job and keeps the trend. Results are cached per day under
+local_data/throughput/, so the dashboard only recomputes once a day.
+
+Usage:
+    python throughput.py [--refresh] [--window 7]
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from arrow_cache import load_table
+from powerfab_db import local_path
+
+COLUMNS = ['ProductionControlID', 'MainMark', 'StationID', 'Quantity', 'Hours',
+           'DateCompleted', 'TimeCompleted']
+RESULTS = ['daily', 'rolling', 'transitions', 'queue_times']
+
+
+def load_completions():
+    """Completed rows from the local snapshot if there is one, else the server."""
+    df = load_table('productioncontrolitemstations', COLUMNS, where='DateCompleted IS NOT NULL')
+    df = df[df['DateCompleted'].notna()]
+    completed = pd.to_datetime(df['DateCompleted']).astype('datetime64[us]')
+    # TimeCompleted is a TIME column ('HH:MM:SS'); missing times count as midnight
+    offset = pd.to_timedelta(df['TimeCompleted'].astype('string'), errors='coerce').fillna(pd.Timedelta(0))
+    return pd.DataFrame({
+        'ProductionControlID': df['ProductionControlID'].astype('int64'),
+        'MainMark': df['MainMark'].astype('string'),
+        'StationID': df['StationID'].astype('Int64'),
+        'Quantity': df['Quantity'].astype('float64').fillna(0),
+        'Hours': df['Hours'].astype('float64').fillna(0),
+        'Day': completed.dt.normalize(),
+        'Completed': completed + offset,
+    })
+
+
+def daily_throughput(df):
+    """Pieces, hours and pieces/hour per station per day."""
+    daily = df.groupby(['StationID', 'Day'], sort=True)[['Quantity', 'Hours']].sum().reset_index()
+    daily['PiecesPerHour'] = daily['Quantity'] / daily['Hours'].where(daily['Hours'] > 0)
+    return daily
+
+
+def rolling_throughput(daily, window=7):
+    """
+    Rolling pieces/hour per station over a calendar window of days.
+    Ratio of rolling sums, so busy days weigh more than quiet ones.
+    """
+    rolled = (daily.set_index('Day')
+              .groupby('StationID')[['Quantity', 'Hours']]
+              .rolling(f'{window}D').sum()
+              .reset_index())
+    rolled['PiecesPerHour'] = rolled['Quantity'] / rolled['Hours'].where(rolled['Hours'] > 0)
+    rolled['Window'] = window
+    return rolled
+
+
+def station_transitions(df):
+    """
+    Time between consecutive station completions of the same MainMark.
+
+    Returns:
+        DataFrame with one row per (FromStation -> StationID) step: the
+        elapsed hours, the hours recorded at the station for that mark
+        (StationHours) and the wait before work started there
+        (WaitHours = ElapsedHours - StationHours, floored at 0), for every
+        main mark that moved between stations
+    """
+    # Earliest completion per mark and station - repeat scans of a piece
+    # at one station are not a new step - and all hours booked there
+    first = (df.groupby(['ProductionControlID', 'MainMark', 'StationID'], sort=False)
+             .agg(Completed=('Completed', 'min'), StationHours=('Hours', 'sum'))
+             .reset_index()
+             .sort_values(['ProductionControlID', 'MainMark', 'Completed'], kind='stable'))
+    same_mark = ((first['ProductionControlID'] == first['ProductionControlID'].shift())
+                 & (first['MainMark'] == first['MainMark'].shift())).fillna(False)
+    first['FromStation'] = first['StationID'].shift().where(same_mark)
+    first['ElapsedHours'] = (first['Completed'] - first['Completed'].shift()).dt.total_seconds() / 3600
+    steps = first[same_mark].copy()
+    steps['FromStation'] = steps['FromStation'].astype('Int64')
+    # Hours are labor hours (several workers can book the same clock hour),
+    # so a step can record more than elapsed - that is no wait, not a negative one
+    steps['WaitHours'] = (steps['ElapsedHours'] - steps['StationHours']).clip(lower=0)
+    return steps[['ProductionControlID', 'MainMark', 'FromStation', 'StationID', 'Completed',
+                  'ElapsedHours', 'StationHours', 'WaitHours']]
+
+
+def queue_times(transitions):
+    """
+    Distribution of wait before each station (hours), across all marks:
+    the time from the previous station's completion to this one's, less
+    the hours worked at this station on the mark.
+    """
+    grouped = transitions.groupby('StationID')['WaitHours']
+    stats = grouped.describe(percentiles=[0.5, 0.9]).reset_index()
+    return stats.rename(columns={'50%': 'P50', '90%': 'P90', 'count': 'Steps'})
+
+
+def cache_dir(day):
+    return local_path('throughput', day, '')
+
+
+def build(window=7):
+    """Compute all throughput results (no cache)."""
+    df = load_completions()
+    daily = daily_throughput(df)
+    transitions = station_transitions(df)
+    return {
+        'daily': daily,
+        'rolling': rolling_throughput(daily, window),
+        'transitions': transitions,
+        'queue_times': queue_times(transitions),
+    }
+
+
+def throughput_dashboard(day=None, window=7, refresh=False):
+    """
+    Throughput results for the dashboard, cached per day.
+
+    Args:
+        day: Cache key 'YYYY-MM-DD', defaults to today
+        window: Rolling window in days
+        refresh: Recompute even if today's cache exists
+
+    Returns:
+        dict of result name -> DataFrame (see RESULTS)
+    """
+    day = day or pd.Timestamp.today().strftime('%Y-%m-%d')
+    folder = cache_dir(f"{day}-w{window}")
+    paths = {name: os.path.join(folder, f'{name}.feather') for name in RESULTS}
+    if not refresh and all(os.path.exists(p) for p in paths.values()):
+        return {name: feather.read_feather(p) for name, p in paths.items()}
+
+    results = build(window)
+    for name, frame in results.items():
+        feather.write_feather(pa.Table.from_pandas(frame, preserve_index=False), paths[name])
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--refresh', action='store_true')
+    parser.add_argument('--window', type=int, default=7)
+    args = parser.parse_args()
+
+    results = throughput_dashboard(window=args.window, refresh=args.refresh)
+    print("\n--- Latest rolling pieces/hour by station ---")
+    latest = results['rolling'].sort_values('Day').groupby('StationID').tail(1)
+    print(latest.to_string(index=False))
+    print("\n--- Queue time before each station (hours) ---")
+    print(results['queue_times'].to_string(index=False))